@@ -1,5 +1,7 @@
 """Allowlist configuration - Only these apps should remain on the device"""
 
+from functools import lru_cache
+
 from config.samsung_critical import SAMSUNG_CRITICAL_NEVER_REMOVE
 
 # CRITICAL SYSTEM APPS - Never remove these
@@ -113,8 +115,25 @@ PHONE_FARM_APPS = [
     # Add your other phone farm apps here
 ]
 
+# Critical system package prefixes that are always allowed
+CRITICAL_PREFIXES = (
+    "android.auto_generated",
+    "com.android.cts",
+    "com.android.internal",
+    "com.android.overlay",
+    "com.samsung.internal",
+    "com.samsung.android.overlay",
+    "com.google.android.overlay",
+    "com.sec.factory",
+    "com.sec.android.Ril",
+    "com.sec.imsservice",
+    "com.samsung.ipservice",
+    "com.samsung.klmsagent",
+)
+
+@lru_cache(maxsize=4)
 def get_full_allowlist(include_optional=False, include_phone_farm=True):
-    """Get the complete allowlist based on configuration"""
+    """Get the complete allowlist based on configuration (cached, immutable)"""
     allowlist = SYSTEM_CRITICAL.copy()
     
     # ALWAYS include Samsung critical apps to prevent bricking
@@ -126,8 +145,8 @@ def get_full_allowlist(include_optional=False, include_phone_farm=True):
     if include_phone_farm:
         allowlist.extend(PHONE_FARM_APPS)
     
-    # Remove duplicates
-    return list(set(allowlist))
+    # Remove duplicates; frozen so the cached result can be shared safely
+    return frozenset(allowlist)
 
 def is_allowed(package_name, allowlist=None):
     """Check if a package is in the allowlist"""
@@ -139,26 +158,7 @@ def is_allowed(package_name, allowlist=None):
         return True
     
     # Check for critical system prefixes that should always be allowed
-    critical_prefixes = [
-        "android.auto_generated",
-        "com.android.cts",
-        "com.android.internal",
-        "com.android.overlay",
-        "com.samsung.internal",
-        "com.samsung.android.overlay",
-        "com.google.android.overlay",
-        "com.sec.factory",
-        "com.sec.android.Ril",
-        "com.sec.imsservice",
-        "com.samsung.ipservice",
-        "com.samsung.klmsagent",
-    ]
-    
-    for prefix in critical_prefixes:
-        if package_name.startswith(prefix):
-            return True
-    
-    return False
+    return package_name.startswith(CRITICAL_PREFIXES)
 
 def should_remove(package_name, allowlist=None):
     """Determine if a package should be removed"""
@@ -1,7 +1,7 @@
 """Bloatware package definitions - apps safe to remove/disable"""
 
 # SAFE TO REMOVE - These apps are generally safe to uninstall
-SAFE_TO_REMOVE = [
+SAFE_TO_REMOVE = frozenset({
     # Facebook
     "com.facebook.katana",
     "com.facebook.system",
@@ -122,10 +122,10 @@ SAFE_TO_REMOVE = [
     "com.samsung.android.aremojieditor",
     "com.samsung.android.app.dressroom",
     "com.samsung.android.forest",
-]
+})
 
 # SAFE TO DISABLE - These system apps can be safely disabled but not uninstalled
-SAFE_TO_DISABLE = [
+SAFE_TO_DISABLE = frozenset({
     # Google Services (disable if not using Google services)
     "com.google.android.feedback",
     "com.google.android.printservice.recommendation",
@@ -156,10 +156,10 @@ SAFE_TO_DISABLE = [
     "com.android.wallpaper.livepicker",
     "com.android.wallpaperbackup",
     "com.android.wallpapercropper",
-]
+})
 
 # DANGEROUS - DO NOT REMOVE (System critical)
-DO_NOT_REMOVE = [
+DO_NOT_REMOVE = frozenset({
     "com.android.systemui",
     "com.android.settings",
     "com.android.phone",
@@ -176,7 +176,7 @@ DO_NOT_REMOVE = [
     "com.google.android.gms",  # Google Play Services
     "com.google.android.gsf",  # Google Services Framework
     "com.android.vending",  # Google Play Store
-]
+})
 
 # Patterns to identify bloatware
 BLOATWARE_PATTERNS = [
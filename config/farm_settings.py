@@ -29,8 +29,12 @@ PERFORMANCE = {
     'max_parallel_operations': {
         'install': 30,
         'configure': 25,
-        'bloatware_removal': 20
-    }
+        'bloatware_removal': 20,
+        'export': 8
+    },
+    
+    # Concurrent `adb install` streams per installer; each pushes a whole APK through the adb server
+    'max_concurrent_installs': 8
 }
 
 # Display settings  
@@ -63,5 +67,9 @@ OPTIMIZATIONS = {
     'enable_device_groups': True,
     
     # Number of devices per group
-    'devices_per_group': 25
+    'devices_per_group': 25,
+    
+    # Switch USB devices to adb over TCP/IP (port 5555) when connecting,
+    # so commands to different phones don't share the USB bus
+    'adb_over_tcp': False
 }
\ No newline at end of file
@@ -5,6 +5,9 @@ from loguru import logger
 import uiautomator2 as u2
 from core.device_manager import Device
 
+# Play Store package of the Super Proxy app
+SUPER_PROXY_PACKAGE = "com.scheler.superproxy"
+
 
 class AppManager:
     def __init__(self):
@@ -178,6 +181,10 @@ class AppManager:
             return False
     
     
+    async def install_super_proxy(self, device: Device) -> bool:
+        """Install Super Proxy from Play Store"""
+        return await self.install_app_from_play_store(device, "Super Proxy", SUPER_PROXY_PACKAGE)
+    
     async def grant_app_permissions(self, device: Device, package_name: str) -> bool:
         """Grant all permissions to an app"""
         try:
@@ -1,17 +1,55 @@
 """Optimized ADB command execution for large device farms"""
 
 import asyncio
+import re
 import subprocess
+from functools import partial
 from typing import List, Dict, Any
 from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 import time
 
+# One "[name]: [value]" line of `getprop` output
+PROP_RE = re.compile(r"\[([^\]]+)\]: \[([^\]]*)\]")
+
+# Fields reported by get_device_properties_batch, read from the full getprop dump
+PROP_FIELDS = {
+    "model": "ro.product.model",
+    "android_version": "ro.build.version.release",
+    "sdk": "ro.build.version.sdk",
+    "brand": "ro.product.brand",
+}
+
 class BatchADB:
     """Execute ADB commands in parallel across multiple devices efficiently"""
     
     def __init__(self, max_workers: int = 50):
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # serial -> every system property, read with a single getprop per device
+        self._props_cache: Dict[str, Dict[str, str]] = {}
+    
+    async def _load_props(self, serial: str) -> Dict[str, str]:
+        """Get all of a device's properties, dumping them once and caching the result"""
+        props = self._props_cache.get(serial)
+        if props is None:
+            loop = asyncio.get_event_loop()
+            result = await loop.run_in_executor(
+                self.executor,
+                partial(subprocess.run, ["adb", "-s", serial, "shell", "getprop"],
+                        capture_output=True, text=True, timeout=5)
+            )
+            props = dict(PROP_RE.findall(result.stdout)) if result.returncode == 0 else {}
+            # Don't cache failures, so the next call retries
+            if props:
+                self._props_cache[serial] = props
+        return props
+    
+    def invalidate_props(self, serial: str = None):
+        """Forget cached properties, e.g. after a reboot or flash (all devices if no serial)"""
+        if serial is None:
+            self._props_cache.clear()
+        else:
+            self._props_cache.pop(serial, None)
     
     async def run_command_batch(
         self, 
@@ -37,15 +75,11 @@ class BatchADB:
             
             try:
                 loop = asyncio.get_event_loop()
+                # argv straight to exec, no /bin/sh; run_in_executor only forwards
+                # positional args, so the keyword options go through partial
                 result = await loop.run_in_executor(
                     self.executor,
-                    subprocess.run,
-                    full_cmd,
-                    {
-                        "capture_output": True,
-                        "text": True,
-                        "timeout": timeout
-                    }
+                    partial(subprocess.run, full_cmd, capture_output=True, text=True, timeout=timeout)
                 )
                 
                 return serial, {
@@ -86,41 +120,31 @@ class BatchADB:
             """Get properties for a single device"""
             props = {}
             
-            # Commands to get various properties
-            prop_commands = {
-                "model": ["shell", "getprop", "ro.product.model"],
-                "android_version": ["shell", "getprop", "ro.build.version.release"],
-                "sdk": ["shell", "getprop", "ro.build.version.sdk"],
-                "brand": ["shell", "getprop", "ro.product.brand"],
-                "ip": ["shell", "ip", "addr", "show", "wlan0"]
-            }
+            # All build properties come from one cached getprop dump
+            try:
+                all_props = await self._load_props(serial)
+                for prop_name, key in PROP_FIELDS.items():
+                    if key in all_props:
+                        props[prop_name] = all_props[key]
+            except:
+                pass
             
-            for prop_name, cmd in prop_commands.items():
-                full_cmd = ["adb", "-s", serial] + cmd
-                try:
-                    loop = asyncio.get_event_loop()
-                    result = await loop.run_in_executor(
-                        self.executor,
-                        subprocess.run,
-                        full_cmd,
-                        {
-                            "capture_output": True,
-                            "text": True,
-                            "timeout": 2
-                        }
-                    )
-                    if result.returncode == 0:
-                        if prop_name == "ip":
-                            # Extract IP from output
-                            for line in result.stdout.split('\n'):
-                                if 'inet ' in line:
-                                    ip = line.split('inet ')[1].split('/')[0]
-                                    props["ip"] = ip
-                                    break
-                        else:
-                            props[prop_name] = result.stdout.strip()
-                except:
-                    pass
+            # The IP can change, so it is always queried
+            try:
+                loop = asyncio.get_event_loop()
+                result = await loop.run_in_executor(
+                    self.executor,
+                    partial(subprocess.run, ["adb", "-s", serial, "shell", "ip", "addr", "show", "wlan0"],
+                            capture_output=True, text=True, timeout=2)
+                )
+                if result.returncode == 0:
+                    # Extract IP from output
+                    for line in result.stdout.split('\n'):
+                        if 'inet ' in line:
+                            props["ip"] = line.split('inet ')[1].split('/')[0]
+                            break
+            except:
+                pass
             
             return serial, props
         
@@ -146,8 +146,7 @@ class BloatwareRemover:
         all_packages = await self.get_all_packages(device)
         
         # Add our special whitelist apps to allowlist temporarily
-        extended_allowlist = self.allowlist.copy() if self.allowlist else []
-        extended_allowlist.extend(self.whitelist)
+        extended_allowlist = (self.allowlist or frozenset()) | frozenset(self.whitelist)
         
         # Determine what to remove
         packages_to_remove = []
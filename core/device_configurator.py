@@ -1,30 +1,55 @@
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from loguru import logger
 import uiautomator2 as u2
 from core.device_manager import Device
+from core.persistent_shell import PersistentShellPool
+
+
+# Bluetooth disable methods: svc always runs first, then cmd (Android 8+) and force-stopping
+# the stack are tried until the adapter reports off. "Off" needs a positive signal - dumpsys
+# showing "enabled: false", or (when dumpsys reports no state) the system's own bluetooth_on
+# setting reading 0 - so an unreadable state counts as still on. After giving an in-flight
+# disable up to a second to land, the verdict is printed last as "off" or "on"; the settings
+# flag is only written after that, so it can't vouch for itself.
+BLUETOOTH_OFF_SCRIPT = (
+    'bt_off() { '
+    's=$(dumpsys bluetooth_manager 2>/dev/null | grep -m 1 -o "enabled: [a-z]*"); '
+    'if [ -n "$s" ]; then [ "$s" = "enabled: false" ]; '
+    'else [ "$(settings get global bluetooth_on 2>/dev/null)" = "0" ]; fi; }; '
+    'svc bluetooth disable >/dev/null 2>&1; '
+    'for c in "cmd bluetooth_manager disable" "am force-stop com.android.bluetooth"; do '
+    'bt_off && break; $c >/dev/null 2>&1; '
+    'done; '
+    'for i in 1 2 3 4 5; do bt_off && break; sleep 0.2; done; '
+    'if bt_off; then r=off; else r=on; fi; '
+    'settings put global bluetooth_on 0; '
+    'echo $r'
+)
 
 
 class DeviceConfigurator:
-    def __init__(self):
+    # Commands sent per shell round-trip by _execute_batch
+    BATCH_SIZE = 64
+    # Echoed after each batch; a batch whose output doesn't end with it didn't run to completion
+    BATCH_DONE = "__BATCH_DONE__"
+    
+    def __init__(self, shell_pool: Optional[PersistentShellPool] = None):
         self.config_tasks = []
+        # One long-lived adb shell per device instead of a round-trip per setting
+        self.shell_pool = shell_pool or PersistentShellPool()
         
     async def disable_bluetooth(self, device: Device) -> bool:
         """Disable Bluetooth on device"""
         try:
             logger.info(f"[{device.serial}] Disabling Bluetooth...")
             
-            # Method 1: Direct settings command
-            await self._execute_shell(device, "settings put global bluetooth_on 0")
-            
-            # Method 2: Using svc command (more reliable on newer Android)
-            await self._execute_shell(device, "svc bluetooth disable")
-            
-            # Method 3: Force stop bluetooth
-            await self._execute_shell(device, "am force-stop com.android.bluetooth")
-            
-            # Method 4: Using cmd command (Android 8+)
-            await self._execute_shell(device, "cmd bluetooth_manager disable")
+            # Try each method on-device, stopping as soon as Bluetooth reports off;
+            # the script's last line is the final state, so one round-trip also verifies it
+            output = await self._execute_shell(device, BLUETOOTH_OFF_SCRIPT)
+            if output.strip().splitlines()[-1:] != ["off"]:
+                logger.warning(f"[{device.serial}] Bluetooth still reports on")
+                return False
             
             logger.success(f"[{device.serial}] Bluetooth disabled")
             return True
@@ -39,10 +64,12 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Disabling cellular data...")
             
             # Disable mobile data
-            await self._execute_shell(device, "svc data disable")
-            
-            # Also disable data roaming
-            await self._execute_shell(device, "settings put global data_roaming 0")
+            await self._execute_batch(device, [
+                "svc data disable",
+
+                # Also disable data roaming
+                "settings put global data_roaming 0",
+            ])
             
             logger.success(f"[{device.serial}] Cellular data disabled")
             return True
@@ -56,8 +83,10 @@ class DeviceConfigurator:
         try:
             logger.info(f"[{device.serial}] Disabling WiFi Direct...")
             
-            await self._execute_shell(device, "settings put global wifi_p2p_device_name ''")
-            await self._execute_shell(device, "settings put global wifi_direct_auto_accept 0")
+            await self._execute_batch(device, [
+                "settings put global wifi_p2p_device_name ''",
+                "settings put global wifi_direct_auto_accept 0",
+            ])
             
             logger.success(f"[{device.serial}] WiFi Direct disabled")
             return True
@@ -72,14 +101,16 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Disabling Nearby Share...")
             
             # Disable Nearby Share
-            await self._execute_shell(device, "settings put secure nearby_sharing_enabled 0")
-            
-            # Disable Quick Share (Samsung devices)
-            await self._execute_shell(device, "settings put secure quick_share 0")
-            
-            # Disable Android Beam / NFC
-            await self._execute_shell(device, "settings put secure android_beam 0")
-            await self._execute_shell(device, "settings put secure nfc_payment_default_component ''")
+            await self._execute_batch(device, [
+                "settings put secure nearby_sharing_enabled 0",
+
+                # Disable Quick Share (Samsung devices)
+                "settings put secure quick_share 0",
+
+                # Disable Android Beam / NFC
+                "settings put secure android_beam 0",
+                "settings put secure nfc_payment_default_component ''",
+            ])
             
             logger.success(f"[{device.serial}] Nearby sharing disabled")
             return True
@@ -93,8 +124,10 @@ class DeviceConfigurator:
         try:
             logger.info(f"[{device.serial}] Disabling NFC...")
             
-            await self._execute_shell(device, "service call nfc 5")  # Disable NFC
-            await self._execute_shell(device, "settings put secure nfc_on 0")
+            await self._execute_batch(device, [
+                "service call nfc 5",  # Disable NFC
+                "settings put secure nfc_on 0",
+            ])
             
             logger.success(f"[{device.serial}] NFC disabled")
             return True
@@ -108,8 +141,10 @@ class DeviceConfigurator:
         try:
             logger.info(f"[{device.serial}] Disabling location services...")
             
-            await self._execute_shell(device, "settings put secure location_mode 0")
-            await self._execute_shell(device, "settings put secure location_providers_allowed ''")
+            await self._execute_batch(device, [
+                "settings put secure location_mode 0",
+                "settings put secure location_providers_allowed ''",
+            ])
             
             logger.success(f"[{device.serial}] Location services disabled")
             return True
@@ -123,8 +158,10 @@ class DeviceConfigurator:
         try:
             logger.info(f"[{device.serial}] Disabling backup and sync...")
             
-            await self._execute_shell(device, "settings put secure backup_enabled 0")
-            await self._execute_shell(device, "settings put secure backup_auto_restore 0")
+            await self._execute_batch(device, [
+                "settings put secure backup_enabled 0",
+                "settings put secure backup_auto_restore 0",
+            ])
             
             logger.success(f"[{device.serial}] Backup and sync disabled")
             return True
@@ -138,16 +175,18 @@ class DeviceConfigurator:
         try:
             logger.info(f"[{device.serial}] Scheduling updates for tomorrow...")
             
-            # Disable automatic updates
-            await self._execute_shell(device, "settings put global auto_update_policy 2")  # 2 = Never auto-update
-            
             # Set update check time to tomorrow 3 AM
             import datetime
             tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
             tomorrow_3am = tomorrow.replace(hour=3, minute=0, second=0)
             
-            # Note: Actual implementation depends on Android version and OEM
-            await self._execute_shell(device, "settings put global update_time_preference " + str(int(tomorrow_3am.timestamp())))
+            await self._execute_batch(device, [
+                # Disable automatic updates
+                "settings put global auto_update_policy 2",  # 2 = Never auto-update
+                
+                # Note: Actual implementation depends on Android version and OEM
+                "settings put global update_time_preference " + str(int(tomorrow_3am.timestamp())),
+            ])
             
             logger.success(f"[{device.serial}] Updates scheduled for tomorrow")
             return True
@@ -162,10 +201,12 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Setting screen timeout to 10 minutes...")
             
             # Set screen timeout to 10 minutes (600000 ms)
-            await self._execute_shell(device, "settings put system screen_off_timeout 600000")
-            
-            # Also keep screen on while charging
-            await self._execute_shell(device, "settings put global stay_on_while_plugged_in 3")  # 3 = AC + USB
+            await self._execute_batch(device, [
+                "settings put system screen_off_timeout 600000",
+
+                # Also keep screen on while charging
+                "settings put global stay_on_while_plugged_in 3",  # 3 = AC + USB
+            ])
             
             logger.success(f"[{device.serial}] Screen timeout set to 10 minutes")
             return True
@@ -180,29 +221,31 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Setting volume levels...")
             
             # Use cmd audio (works on Android 8+)
-            await self._execute_shell(device, "cmd audio set-stream-volume 0 1 0")  # Voice call
-            await self._execute_shell(device, "cmd audio set-stream-volume 1 1 0")  # System  
-            await self._execute_shell(device, "cmd audio set-stream-volume 2 1 0")  # Ring
-            await self._execute_shell(device, "cmd audio set-stream-volume 3 1 0")  # Media/Music
-            await self._execute_shell(device, "cmd audio set-stream-volume 4 1 0")  # Alarm
-            await self._execute_shell(device, "cmd audio set-stream-volume 5 1 0")  # Notification
-            
-            # Also use settings as fallback
-            await self._execute_shell(device, "settings put system volume_voice 1")
-            await self._execute_shell(device, "settings put system volume_system 1")
-            await self._execute_shell(device, "settings put system volume_ring 1")
-            await self._execute_shell(device, "settings put system volume_music 1")
-            await self._execute_shell(device, "settings put system volume_alarm 1")
-            await self._execute_shell(device, "settings put system volume_notification 1")
-            
-            # Set ringer mode to normal (not silent, not vibrate) 
-            await self._execute_shell(device, "settings put global mode_ringer 2")
-            
-            # Disable touch sounds
-            await self._execute_shell(device, "settings put system sound_effects_enabled 0")
-            await self._execute_shell(device, "settings put system haptic_feedback_enabled 0")
-            await self._execute_shell(device, "settings put system dtmf_tone 0")
-            await self._execute_shell(device, "settings put system lockscreen_sounds_enabled 0")
+            await self._execute_batch(device, [
+                "cmd audio set-stream-volume 0 1 0",  # Voice call
+                "cmd audio set-stream-volume 1 1 0",  # System  
+                "cmd audio set-stream-volume 2 1 0",  # Ring
+                "cmd audio set-stream-volume 3 1 0",  # Media/Music
+                "cmd audio set-stream-volume 4 1 0",  # Alarm
+                "cmd audio set-stream-volume 5 1 0",  # Notification
+
+                # Also use settings as fallback
+                "settings put system volume_voice 1",
+                "settings put system volume_system 1",
+                "settings put system volume_ring 1",
+                "settings put system volume_music 1",
+                "settings put system volume_alarm 1",
+                "settings put system volume_notification 1",
+
+                # Set ringer mode to normal (not silent, not vibrate)
+                "settings put global mode_ringer 2",
+
+                # Disable touch sounds
+                "settings put system sound_effects_enabled 0",
+                "settings put system haptic_feedback_enabled 0",
+                "settings put system dtmf_tone 0",
+                "settings put system lockscreen_sounds_enabled 0",
+            ])
             
             logger.success(f"[{device.serial}] Volume levels set")
             return True
@@ -217,25 +260,27 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Enabling Do Not Disturb...")
             
             # Method 1: Using cmd notification (most reliable)
-            await self._execute_shell(device, "cmd notification set_dnd on")
-            
-            # Method 2: Using settings (for older devices)
-            await self._execute_shell(device, "settings put global zen_mode 2")  # 2 = No interruptions
-            
-            # Method 3: Using service call
-            await self._execute_shell(device, "service call notification 4 i32 2")  # Enable DND
-            
-            # Configure DND settings
-            await self._execute_shell(device, "settings put global zen_mode_important_interruptions 0")  # No interruptions
-            await self._execute_shell(device, "settings put secure zen_duration 0")  # Until turned off
-            await self._execute_shell(device, "settings put secure zen_settings_updated 1")
-            
-            # Disable all notification types
-            await self._execute_shell(device, "settings put global heads_up_notifications_enabled 0")
-            await self._execute_shell(device, "settings put secure notification_badging 0")
-            
-            # Set ringer to vibrate mode as backup
-            await self._execute_shell(device, "settings put global mode_ringer 1")  # Vibrate mode
+            await self._execute_batch(device, [
+                "cmd notification set_dnd on",
+
+                # Method 2: Using settings (for older devices)
+                "settings put global zen_mode 2",  # 2 = No interruptions
+
+                # Method 3: Using service call
+                "service call notification 4 i32 2",  # Enable DND
+
+                # Configure DND settings
+                "settings put global zen_mode_important_interruptions 0",  # No interruptions
+                "settings put secure zen_duration 0",  # Until turned off
+                "settings put secure zen_settings_updated 1",
+
+                # Disable all notification types
+                "settings put global heads_up_notifications_enabled 0",
+                "settings put secure notification_badging 0",
+
+                # Set ringer to vibrate mode as backup
+                "settings put global mode_ringer 1",  # Vibrate mode
+            ])
             
             logger.success(f"[{device.serial}] Do Not Disturb enabled")
             return True
@@ -250,9 +295,11 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Disabling animations...")
             
             # Disable all animations
-            await self._execute_shell(device, "settings put global window_animation_scale 0")
-            await self._execute_shell(device, "settings put global transition_animation_scale 0")
-            await self._execute_shell(device, "settings put global animator_duration_scale 0")
+            await self._execute_batch(device, [
+                "settings put global window_animation_scale 0",
+                "settings put global transition_animation_scale 0",
+                "settings put global animator_duration_scale 0",
+            ])
             
             logger.success(f"[{device.serial}] Animations disabled")
             return True
@@ -267,13 +314,15 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Forcing portrait mode...")
             
             # Disable auto-rotate
-            await self._execute_shell(device, "settings put system accelerometer_rotation 0")
-            
-            # Force portrait orientation (0 = portrait, 1 = landscape, 2 = reverse portrait, 3 = reverse landscape)
-            await self._execute_shell(device, "settings put system user_rotation 0")
-            
-            # Additional command for forcing portrait on some devices
-            await self._execute_shell(device, "content insert --uri content://settings/system --bind name:s:user_rotation --bind value:i:0")
+            await self._execute_batch(device, [
+                "settings put system accelerometer_rotation 0",
+
+                # Force portrait orientation (0 = portrait, 1 = landscape, 2 = reverse portrait, 3 = reverse landscape)
+                "settings put system user_rotation 0",
+
+                # Additional command for forcing portrait on some devices
+                "content insert --uri content://settings/system --bind name:s:user_rotation --bind value:i:0",
+            ])
             
             logger.success(f"[{device.serial}] Portrait mode forced")
             return True
@@ -288,13 +337,15 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Disabling auto-rotate...")
             
             # Disable accelerometer rotation
-            await self._execute_shell(device, "settings put system accelerometer_rotation 0")
-            
-            # Set rotation lock
-            await self._execute_shell(device, "settings put system rotation_lock 1")
-            
-            # Alternative method using content provider
-            await self._execute_shell(device, "content insert --uri content://settings/system --bind name:s:accelerometer_rotation --bind value:i:0")
+            await self._execute_batch(device, [
+                "settings put system accelerometer_rotation 0",
+
+                # Set rotation lock
+                "settings put system rotation_lock 1",
+
+                # Alternative method using content provider
+                "content insert --uri content://settings/system --bind name:s:accelerometer_rotation --bind value:i:0",
+            ])
             
             logger.success(f"[{device.serial}] Auto-rotate disabled")
             return True
@@ -309,52 +360,54 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Disabling emergency alerts...")
             
             # Disable Cell Broadcast SMS (main toggle for emergency alerts)
-            await self._execute_shell(device, "settings put global cdma_cell_broadcast_sms 0")
-            await self._execute_shell(device, "settings put global cell_broadcast_sms 0")
-            
-            # Disable AMBER alerts
-            await self._execute_shell(device, "settings put secure cmas_amber_alert_enabled 0")
-            await self._execute_shell(device, "settings put secure enable_cmas_amber_alerts 0")
-            
-            # Disable extreme threat alerts
-            await self._execute_shell(device, "settings put secure cmas_extreme_threat_alert_enabled 0")
-            await self._execute_shell(device, "settings put secure enable_cmas_extreme_threat_alerts 0")
-            
-            # Disable severe threat alerts
-            await self._execute_shell(device, "settings put secure cmas_severe_threat_alert_enabled 0")
-            await self._execute_shell(device, "settings put secure enable_cmas_severe_threat_alerts 0")
-            
-            # Disable presidential alerts (note: some regions may not allow disabling these)
-            await self._execute_shell(device, "settings put secure cmas_presidential_alert_enabled 0")
-            await self._execute_shell(device, "settings put secure enable_cmas_presidential_alerts 0")
-            
-            # Disable emergency alert reminders
-            await self._execute_shell(device, "settings put secure alert_reminder_interval 0")
-            
-            # Disable public safety messages
-            await self._execute_shell(device, "settings put secure public_safety_messages 0")
-            await self._execute_shell(device, "settings put secure enable_public_safety_messages 0")
-            
-            # Disable state/local test alerts
-            await self._execute_shell(device, "settings put secure cmas_test_alert_enabled 0")
-            await self._execute_shell(device, "settings put secure enable_cmas_test_alerts 0")
-            
-            # Disable emergency alert vibration
-            await self._execute_shell(device, "settings put secure cmas_vibrate_enabled 0")
-            await self._execute_shell(device, "settings put secure enable_alert_vibrate 0")
-            
-            # Disable opt-out dialog for alerts
-            await self._execute_shell(device, "settings put secure show_cmas_opt_out_dialog 0")
-            
-            # Disable ETWS (Earthquake and Tsunami Warning System)
-            await self._execute_shell(device, "settings put secure enable_etws_test_alerts 0")
-            await self._execute_shell(device, "settings put secure etws_test_alert_enabled 0")
-            
-            # Disable channel 50 alerts (Brazil)
-            await self._execute_shell(device, "settings put secure enable_channel_50_alerts 0")
-            
-            # Disable all alert sounds
-            await self._execute_shell(device, "settings put secure enable_alert_speech 0")
+            commands = [
+                "settings put global cdma_cell_broadcast_sms 0",
+                "settings put global cell_broadcast_sms 0",
+
+                # Disable AMBER alerts
+                "settings put secure cmas_amber_alert_enabled 0",
+                "settings put secure enable_cmas_amber_alerts 0",
+
+                # Disable extreme threat alerts
+                "settings put secure cmas_extreme_threat_alert_enabled 0",
+                "settings put secure enable_cmas_extreme_threat_alerts 0",
+
+                # Disable severe threat alerts
+                "settings put secure cmas_severe_threat_alert_enabled 0",
+                "settings put secure enable_cmas_severe_threat_alerts 0",
+
+                # Disable presidential alerts (note: some regions may not allow disabling these)
+                "settings put secure cmas_presidential_alert_enabled 0",
+                "settings put secure enable_cmas_presidential_alerts 0",
+
+                # Disable emergency alert reminders
+                "settings put secure alert_reminder_interval 0",
+
+                # Disable public safety messages
+                "settings put secure public_safety_messages 0",
+                "settings put secure enable_public_safety_messages 0",
+
+                # Disable state/local test alerts
+                "settings put secure cmas_test_alert_enabled 0",
+                "settings put secure enable_cmas_test_alerts 0",
+
+                # Disable emergency alert vibration
+                "settings put secure cmas_vibrate_enabled 0",
+                "settings put secure enable_alert_vibrate 0",
+
+                # Disable opt-out dialog for alerts
+                "settings put secure show_cmas_opt_out_dialog 0",
+
+                # Disable ETWS (Earthquake and Tsunami Warning System)
+                "settings put secure enable_etws_test_alerts 0",
+                "settings put secure etws_test_alert_enabled 0",
+
+                # Disable channel 50 alerts (Brazil)
+                "settings put secure enable_channel_50_alerts 0",
+
+                # Disable all alert sounds
+                "settings put secure enable_alert_speech 0",
+            ]
             
             # Disable notifications for Cell Broadcast apps
             cell_broadcast_apps = [
@@ -365,11 +418,15 @@ class DeviceConfigurator:
             ]
             
             for app in cell_broadcast_apps:
-                # Disable the app if it exists
-                await self._execute_shell(device, f"pm disable-user --user 0 {app}")
-                # Block notifications from the app
-                await self._execute_shell(device, f"cmd notification disallow_assistant {app}")
-                await self._execute_shell(device, f"cmd appops set {app} POST_NOTIFICATION ignore")
+                commands += [
+                    # Disable the app if it exists
+                    f"pm disable-user --user 0 {app}",
+                    # Block notifications from the app
+                    f"cmd notification disallow_assistant {app}",
+                    f"cmd appops set {app} POST_NOTIFICATION ignore",
+                ]
+            
+            await self._execute_batch(device, commands)
             
             logger.success(f"[{device.serial}] Emergency alerts disabled")
             return True
@@ -384,20 +441,22 @@ class DeviceConfigurator:
             logger.info(f"[{device.serial}] Applying privacy settings...")
             
             # Disable usage access for apps
-            await self._execute_shell(device, "settings put secure usage_stats_enabled 0")
-            
-            # Disable error reporting
-            await self._execute_shell(device, "settings put secure send_action_app_error 0")
-            
-            # Disable advertising ID
-            await self._execute_shell(device, "settings put secure limit_ad_tracking 1")
-            await self._execute_shell(device, "settings put secure advertising_id ''")
-            
-            # Reset Android ID for anonymity
-            await self._execute_shell(device, "settings put secure android_id ''")
-            
-            # Disable personalized ads
-            await self._execute_shell(device, "settings put secure ad_personalization 0")
+            await self._execute_batch(device, [
+                "settings put secure usage_stats_enabled 0",
+
+                # Disable error reporting
+                "settings put secure send_action_app_error 0",
+
+                # Disable advertising ID
+                "settings put secure limit_ad_tracking 1",
+                "settings put secure advertising_id ''",
+
+                # Reset Android ID for anonymity
+                "settings put secure android_id ''",
+
+                # Disable personalized ads
+                "settings put secure ad_personalization 0",
+            ])
             
             logger.success(f"[{device.serial}] Privacy settings applied")
             return True
@@ -447,14 +506,27 @@ class DeviceConfigurator:
         
         return results
     
+    async def _execute_batch(self, device: Device, commands: List[str]) -> str:
+        """Run independent commands as one shell script, a chunk per round-trip"""
+        output = []
+        for start in range(0, len(commands), self.BATCH_SIZE):
+            # ';' rather than '&&' so one failing setting doesn't skip the rest
+            chunk = commands[start:start + self.BATCH_SIZE] + [f"echo {self.BATCH_DONE}"]
+            result = (await self._execute_shell(device, " ; ".join(chunk))).rstrip()
+            if not result.endswith(self.BATCH_DONE):
+                raise Exception(f"Batch of {len(chunk) - 1} commands did not complete")
+            output.append(result[:-len(self.BATCH_DONE)])
+        return "\n".join(output)
+    
     async def _execute_shell(self, device: Device, command: str) -> str:
-        """Execute shell command on device using uiautomator2"""
-        if device.u2_device:
-            try:
-                output = device.u2_device.shell(command)
-                return output[0] if isinstance(output, tuple) else output
-            except Exception as e:
-                logger.debug(f"Command failed (may be normal): {command} - {e}")
-                return ""
-        else:
-            raise Exception(f"Device {device.serial} not connected")
\ No newline at end of file
+        """Execute shell command on device over its persistent adb shell"""
+        if device.status not in ("device", "connected"):
+            raise Exception(f"Device {device.serial} not connected")
+        
+        try:
+            _, output = await self.shell_pool.run(device.serial, command)
+            return output
+        except Exception as e:
+            # The session itself failed (timeout, adb gone); the caller's step can't have worked
+            logger.warning(f"[{device.serial}] Shell session failed: {e or type(e).__name__}")
+            raise
\ No newline at end of file
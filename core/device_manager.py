@@ -1,7 +1,9 @@
 import asyncio
+import re
 import subprocess
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from dataclasses import dataclass
+from functools import partial
 from loguru import logger
 import uiautomator2 as u2
 from adb_shell.adb_device import AdbDeviceTcp, AdbDeviceUsb
@@ -11,6 +13,7 @@ import os
 import time
 import json
 from pathlib import Path
+from core.persistent_shell import PersistentShellPool
 
 try:
     from config.farm_settings import PERFORMANCE, OPTIMIZATIONS
@@ -22,7 +25,7 @@ except ImportError:
         'batch_sizes': {'small': 10, 'medium': 25, 'large': 50, 'xlarge': 75},
         'connection_timeout': 5
     }
-    OPTIMIZATIONS = {'skip_device_info': True}
+    OPTIMIZATIONS = {'skip_device_info': True, 'adb_over_tcp': False}
 
 
 @dataclass
@@ -41,12 +44,19 @@ class Device:
 
 
 class DeviceManager:
+    # A scan younger than this (seconds) is reused instead of re-running `adb devices`
+    SCAN_TTL = 2.0
+    
     def __init__(self):
         self.devices: Dict[str, Device] = {}
         self.adb_key_path = os.path.expanduser("~/.android/adbkey")
         self._ensure_adb_key()
         self.cache_file = Path("data/device_cache.json")
         self._load_device_cache()
+        self.shell_pool = PersistentShellPool()
+        self._last_scan = 0.0
+        # USB serial -> "ip:port" for devices moved onto adb-over-TCP
+        self._tcp_aliases: Dict[str, str] = {}
         
     def _ensure_adb_key(self):
         """Ensure ADB RSA key exists"""
@@ -90,77 +100,228 @@ class DeviceManager:
         except Exception as e:
             logger.debug(f"Could not save device cache: {e}")
     
-    async def scan_devices(self) -> List[Device]:
-        """Scan for all connected ADB devices"""
+    async def iter_devices(self) -> AsyncIterator[Device]:
+        """Yield devices as they are parsed from `adb devices -l`, updating self.devices"""
+        # Start ADB server with timeout
+        server = await asyncio.create_subprocess_exec(
+            "adb", "start-server", stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
         try:
-            # Start ADB server with timeout
-            subprocess.run(["adb", "start-server"], capture_output=True, timeout=10)
-            
-            # Get device list with timeout
-            result = subprocess.run(
-                ["adb", "devices", "-l"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            lines = result.stdout.strip().split('\n')[1:]  # Skip header
-            
-            # Track which devices are currently plugged in
-            currently_plugged_serials = set()
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # Split by whitespace
-                parts = line.split()
-                if len(parts) < 2:
-                    continue
-                    
-                serial = parts[0]
-                status = parts[1]
-                currently_plugged_serials.add(serial)
-                
-                # Extract model from the detailed info
-                model = "Unknown"
-                if "model:" in line:
-                    model_part = line.split("model:")[1]
-                    model = model_part.split()[0].replace("_", " ")
+            await asyncio.wait_for(server.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            # Don't leave a hung adb client behind
+            try:
+                server.kill()
+            except ProcessLookupError:
+                pass
+            await server.wait()
+            raise
+        
+        # Stream the device list so callers can start on a device right away
+        process = await asyncio.create_subprocess_exec(
+            "adb", "devices", "-l", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        
+        # Track which devices are currently plugged in
+        currently_plugged_serials = set()
+        
+        try:
+            await asyncio.wait_for(process.stdout.readline(), timeout=10)  # Skip header
+            while True:
+                raw_line = await asyncio.wait_for(process.stdout.readline(), timeout=10)
+                if not raw_line:
+                    break
                 
-                if serial not in self.devices:
-                    device = Device(serial=serial, model=model, status=status)
-                    self.devices[serial] = device
-                    logger.info(f"Found new device: {serial} ({model})")
-                else:
-                    # Update existing device status
-                    existing_device = self.devices[serial]
-                    
-                    # If device was disconnected and now reappears, update its status
-                    if existing_device.status == "disconnected":
-                        existing_device.status = status
-                        existing_device.model = model  # Update model in case it changed
-                        logger.info(f"Device reconnected: {serial} -> {status}")
-                    # Only update status if device is not already connected
-                    elif existing_device.status != "connected":
-                        existing_device.status = status
-                        logger.debug(f"Updated device status: {serial} -> {status}")
-            
-            # Mark devices as disconnected if they're no longer in adb devices list
-            for serial, device in self.devices.items():
-                if serial not in currently_plugged_serials:
-                    if device.status != "disconnected":
-                        device.status = "disconnected"
-                        device.u2_device = None  # Clear the connection
-                        logger.info(f"Device disconnected: {serial}")
+                device = self._update_device_from_line(raw_line.decode(errors="replace").strip())
+                if device:
+                    currently_plugged_serials.add(device.serial)
+                    yield device
+        finally:
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+            await process.wait()
+        
+        # Mark devices as disconnected if they're no longer in adb devices list
+        for serial, device in self.devices.items():
+            if serial not in currently_plugged_serials:
+                if device.status != "disconnected":
+                    device.status = "disconnected"
+                    device.u2_device = None  # Clear the connection
+                    logger.info(f"Device disconnected: {serial}")
+        
+        self._last_scan = time.monotonic()
+    
+    def _update_device_from_line(self, line: str) -> Optional[Device]:
+        """Create or update a device from one `adb devices -l` line"""
+        if not line:
+            return None
+        
+        # Split by whitespace
+        parts = line.split()
+        if len(parts) < 2:
+            return None
+        
+        serial = parts[0]
+        status = parts[1]
+        
+        # A device moved to TCP still shows up over USB; only track it by its network address
+        if serial in self._tcp_aliases:
+            return self.devices.get(self._tcp_aliases[serial])
+        
+        # Extract model from the detailed info
+        model = "Unknown"
+        if "model:" in line:
+            model_part = line.split("model:")[1]
+            model = model_part.split()[0].replace("_", " ")
+        
+        if serial not in self.devices:
+            device = Device(serial=serial, model=model, status=status)
+            self.devices[serial] = device
+            logger.info(f"Found new device: {serial} ({model})")
+        else:
+            # Update existing device status
+            device = self.devices[serial]
             
+            # If device was disconnected and now reappears, update its status
+            if device.status == "disconnected":
+                device.status = status
+                device.model = model  # Update model in case it changed
+                logger.info(f"Device reconnected: {serial} -> {status}")
+            # Only update status if device is not already connected
+            elif device.status != "connected":
+                device.status = status
+                logger.debug(f"Updated device status: {serial} -> {status}")
+        
+        return device
+    
+    async def scan_devices(self, max_age: float = 0) -> List[Device]:
+        """Scan for all connected ADB devices, reusing a scan newer than max_age seconds (if given)"""
+        if max_age and time.monotonic() - self._last_scan < max_age:
+            return list(self.devices.values())
+        
+        try:
+            async for _ in self.iter_devices():
+                pass
             return list(self.devices.values())
             
         except Exception as e:
             logger.error(f"Error scanning devices: {e}")
             return []
     
+    async def scan_and_connect(self, fast_mode: bool = False) -> int:
+        """Scan for devices and start connecting each authorized one as soon as it is listed"""
+        semaphore = asyncio.Semaphore(PERFORMANCE['max_concurrent_connections'])
+        
+        async def connect(device):
+            async with semaphore:
+                return await self.connect_device(device, skip_u2=fast_mode)
+        
+        if OPTIMIZATIONS.get('adb_over_tcp'):
+            # Promotion bounces devices off USB, so finish the scan, promote, then connect to the re-listed devices
+            await self.scan_devices()
+            await self.promote_all_to_tcpip()
+            results = await asyncio.gather(
+                *(connect(d) for d in list(self.devices.values()) if d.status == "device"), return_exceptions=True
+            )
+            return sum(1 for r in results if r is True)
+        
+        tasks = []
+        try:
+            async for device in self.iter_devices():
+                if device.status == "device":
+                    tasks.append(asyncio.create_task(connect(device)))
+        except Exception as e:
+            logger.error(f"Error scanning devices: {e}")
+        
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            raise
+        return sum(1 for r in results if r is True)
+    
+    async def promote_all_to_tcpip(self) -> int:
+        """Move every authorized USB device onto adb-over-TCP, then re-list devices
+        
+        Only call this once a scan has finished: a device restarting adbd in TCP mode
+        drops off USB for a moment, and a scan running alongside would mark it disconnected.
+        """
+        usb_devices = [d for d in self.devices.values() if d.status == "device" and ":" not in d.serial]
+        if not usb_devices:
+            return 0
+        
+        semaphore = asyncio.Semaphore(PERFORMANCE['max_concurrent_connections'])
+        
+        async def promote(device):
+            async with semaphore:
+                return await self.promote_to_tcpip(device)
+        
+        promoted = sum(await asyncio.gather(*(promote(d) for d in usb_devices)))
+        if promoted:
+            # Pick up the network transports now that the devices have settled
+            await self.scan_devices()
+        logger.info(f"Moved {promoted}/{len(usb_devices)} device(s) to adb over TCP")
+        return promoted
+    
+    async def promote_to_tcpip(self, device: Device, port: int = 5555) -> bool:
+        """Move a USB device onto adb-over-TCP and address it by ip:port from then on
+        
+        Commands to different phones then travel over separate sockets instead of
+        sharing the USB bus. Falls back to USB (returns False) if any step fails.
+        """
+        if ":" in device.serial:
+            return True  # Already a network device
+        
+        usb_serial = device.serial
+        try:
+            _, output = await self.shell(device, "ip -f inet addr show wlan0", timeout=5)
+            match = re.search(r"inet (\d+\.\d+\.\d+\.\d+)/", output)
+            if not match:
+                logger.debug(f"{usb_serial}: no wlan0 address, staying on USB")
+                return False
+            address = f"{match.group(1)}:{port}"
+            
+            # Restart adbd in TCP mode, then connect (adbd needs a moment to come back up)
+            await self._adb("-s", usb_serial, "tcpip", str(port))
+            for _ in range(5):
+                _, output = await self._adb("connect", address)
+                if "connected to" in output:
+                    break
+                await asyncio.sleep(0.5)
+            else:
+                logger.warning(f"{usb_serial}: could not connect to {address}, staying on USB")
+                return False
+        except Exception as e:
+            logger.warning(f"{usb_serial}: TCP/IP switch failed, staying on USB: {e}")
+            return False
+        
+        # Re-key the device under its network address
+        await self.shell_pool.close_serial(usb_serial)
+        self.devices.pop(usb_serial, None)
+        device.serial = address
+        self.devices[address] = device
+        self._tcp_aliases[usb_serial] = address
+        logger.info(f"{usb_serial} now on adb over TCP at {address}")
+        return True
+    
+    async def _adb(self, *args: str, timeout: float = 10) -> Tuple[int, str]:
+        """Run a one-shot adb command, returning (returncode, combined output)"""
+        process = await asyncio.create_subprocess_exec(
+            "adb", *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        return process.returncode, stdout.decode(errors="replace")
+    
     async def connect_device(self, device: Device, skip_u2: bool = False) -> bool:
         """Initialize connection for a device
         
@@ -189,11 +350,11 @@ class DeviceManager:
                     # Try to get basic info without UIAutomator2
                     try:
                         loop = asyncio.get_event_loop()
+                        # run_in_executor only forwards positional args, so the options go through partial
                         result = await loop.run_in_executor(
                             None,
-                            subprocess.run,
-                            ["adb", "-s", device.serial, "shell", "getprop", "ro.product.model"],
-                            {"capture_output": True, "text": True, "timeout": 2}
+                            partial(subprocess.run, ["adb", "-s", device.serial, "shell", "getprop", "ro.product.model"],
+                                    capture_output=True, text=True, timeout=2)
                         )
                         if result.returncode == 0:
                             device.model = result.stdout.strip().replace("_", " ")
@@ -244,6 +405,10 @@ class DeviceManager:
         else:
             devices = list(self.devices.values())
         
+        # Move devices onto TCP/IP before connecting, so every connection is made over the new transport
+        if devices and OPTIMIZATIONS.get('adb_over_tcp') and await self.promote_all_to_tcpip():
+            devices = list(self.devices.values())
+        
         if not devices:
             logger.warning("No devices found")
             return 0
@@ -363,8 +528,8 @@ class DeviceManager:
         try:
             # Check if the DoubleSpeed app is running with VPN service
             result = subprocess.run(
-                ["adb", "-s", device.serial, "shell", 
-                 "dumpsys activity services com.android.systemui.helper"],
+                ["adb", "-s", device.serial, "shell",
+                 "dumpsys", "activity", "services", "com.android.systemui.helper"],
                 capture_output=True,
                 text=True,
                 timeout=5
@@ -379,21 +544,21 @@ class DeviceManager:
             
             # Check if app is at least installed and running
             ps_result = subprocess.run(
-                ["adb", "-s", device.serial, "shell", 
-                 "ps -A | grep com.android.systemui.helper"],
+                ["adb", "-s", device.serial, "shell",
+                 "pidof", "com.android.systemui.helper"],
                 capture_output=True,
                 text=True,
                 timeout=5
             )
             
-            if "com.android.systemui.helper" in ps_result.stdout:
+            if ps_result.returncode == 0 and ps_result.stdout.strip():
                 # App is running but proxy might not be active
                 return "App Open"
             
             # Check if proxy settings are configured (app installed)
             package_result = subprocess.run(
                 ["adb", "-s", device.serial, "shell",
-                 "pm list packages | grep com.android.systemui.helper"],
+                 "pm", "list", "packages", "com.android.systemui.helper"],
                 capture_output=True,
                 text=True,
                 timeout=5
@@ -413,7 +578,8 @@ class DeviceManager:
         network_info = {
             'interfaces': [],
             'primary_ip': None,
-            'primary_interface': None
+            'primary_interface': None,
+            'primary_type': None
         }
         
         try:
@@ -486,6 +652,10 @@ class DeviceManager:
                                 network_info['primary_ip'] = ip_addr
                                 network_info['primary_interface'] = current_interface
             
+            # Resolved once here so displays don't search the interface list
+            if network_info['primary_interface']:
+                network_info['primary_type'] = self._get_interface_type(network_info['primary_interface'])
+            
             device.network_info = network_info
             return network_info
             
@@ -511,16 +681,15 @@ class DeviceManager:
         else:
             return 'Unknown'
     
+    async def shell(self, device: Device, command: str, timeout: float = 30) -> Tuple[int, str]:
+        """Run a shell command over the device's persistent adb shell, returning (returncode, stdout)"""
+        return await self.shell_pool.run(device.serial, command, timeout)
+    
     async def execute_adb_command(self, device: Device, command: str) -> Optional[str]:
         """Execute ADB shell command on device"""
         try:
-            result = subprocess.run(
-                ["adb", "-s", device.serial, "shell", command],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            return result.stdout
+            _, output = await self.shell(device, command)
+            return output
         except Exception as e:
             logger.error(f"ADB command failed on {device.serial}: {e}")
             return None
\ No newline at end of file
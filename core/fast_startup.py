@@ -1,7 +1,9 @@
 """Fast startup optimizations for large phone farms"""
 
 import asyncio
+import os
 import subprocess
+import sys
 import time
 from typing import List, Set
 from loguru import logger
@@ -10,6 +12,25 @@ from concurrent.futures import ThreadPoolExecutor
 class FastStartup:
     """Optimized startup procedures for 100+ device farms"""
     
+    @staticmethod
+    def use_pidfd_child_watcher() -> bool:
+        """Reap adb subprocesses via pidfds instead of SIGCHLD (Linux 5.3+, Python < 3.12)"""
+        # 3.12+ already picks a pidfd watcher on its own
+        if not sys.platform.startswith("linux") or sys.version_info >= (3, 12):
+            return False
+        if not hasattr(os, "pidfd_open") or not hasattr(asyncio, "PidfdChildWatcher"):
+            return False
+        
+        try:
+            # Probe kernel support before switching
+            os.close(os.pidfd_open(os.getpid()))
+            asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
+            logger.debug("Using pidfd child watcher")
+            return True
+        except OSError as e:
+            logger.debug(f"pidfd child watcher unavailable: {e}")
+            return False
+    
     @staticmethod
     async def prewarm_adb_server():
         """Pre-warm ADB server for faster device detection"""
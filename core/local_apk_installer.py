@@ -1,17 +1,41 @@
 """Local APK installer with split APK support"""
 
 import os
+import re
 import asyncio
+import shutil
+import struct
 import subprocess
-from typing import List, Dict, Optional
+import zipfile
+import aiofiles
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 from loguru import logger
 from core.device_manager import Device
 
+try:
+    from config.farm_settings import PERFORMANCE
+except ImportError:
+    PERFORMANCE = {'max_concurrent_installs': 8}
+
+# Package name from the "package:" line of aapt/aapt2 dump badging
+_PKG_RE = re.compile(rb"^package: name='([^']+)'", re.M)
+
 
 class LocalAPKInstaller:
     def __init__(self):
         self.apks_dir = Path("apks")
+        # Package names keyed by (path, mtime_ns, size) so repeat installs skip aapt
+        self._pkg_cache: Dict[tuple, str] = {}
+        # Resolve the aapt binary once rather than failing an exec per APK
+        self._aapt_bin = shutil.which("aapt") or shutil.which("aapt2")
+        # Last scan result, keyed by the mtimes of apks/ and its app folders
+        self._scan_cache: Optional[tuple] = None
+        # Caps concurrent installs so large fan-outs don't swamp the adb server
+        self._install_limit = int(os.environ.get(
+            "ADB_INSTALL_CONCURRENCY", PERFORMANCE.get('max_concurrent_installs', 8)
+        ))
+        self._install_sem: Optional[asyncio.Semaphore] = None
         
     def scan_apk_folders(self) -> Dict[str, List[str]]:
         """Scan APK folder for available apps and their APK files"""
@@ -21,83 +45,258 @@ class LocalAPKInstaller:
             logger.warning(f"APK directory {self.apks_dir} does not exist")
             return apps
         
+        # Adding/removing an APK bumps its folder's mtime, so the folder mtimes
+        # are enough to tell whether a rescan is needed
+        try:
+            with os.scandir(self.apks_dir) as entries:
+                signature = (self.apks_dir.stat().st_mtime_ns, tuple(sorted(
+                    (entry.name, entry.stat().st_mtime_ns)
+                    for entry in entries if entry.is_dir() and not entry.name.startswith('.')
+                )))
+        except OSError:
+            signature = None
+        
+        if signature and self._scan_cache and self._scan_cache[0] == signature:
+            return self._scan_cache[1]
+        
         # Scan for app folders
-        for item in self.apks_dir.iterdir():
-            if item.is_dir() and not item.name.startswith('.'):
-                apk_files = list(item.glob("*.apk"))
+        with os.scandir(self.apks_dir) as folders:
+            for item in folders:
+                if not item.is_dir() or item.name.startswith('.'):
+                    continue
+                with os.scandir(item.path) as files:
+                    apk_files = [f.path for f in files if f.is_file(follow_symlinks=False) and f.name.endswith('.apk')]
                 if apk_files:
                     # Sort APK files: base.apk first, then splits
-                    apk_files.sort(key=lambda x: (not x.name.startswith("base"), x.name))
-                    apps[item.name] = [str(f) for f in apk_files]
+                    apk_files.sort(key=lambda p: (not os.path.basename(p).startswith("base"), p))
+                    apps[item.name] = apk_files
                     logger.debug(f"Found app '{item.name}' with {len(apk_files)} APK file(s)")
         
+        if signature:
+            self._scan_cache = (signature, apps)
         return apps
     
     async def check_app_installed(self, device: Device, package_name: str) -> bool:
         """Check if an app is already installed on device"""
         try:
             result = subprocess.run(
-                ["adb", "-s", device.serial, "shell", "pm", "list", "packages"],
+                ["adb", "-s", device.serial, "shell", "pm", "list", "packages", package_name],
                 capture_output=True,
-                text=True,
                 timeout=10
             )
             
             if result.returncode == 0:
-                # Check if package appears in the list
-                return f"package:{package_name}" in result.stdout
+                # pm filters by substring, so look for an exact line match
+                return f"package:{package_name}".encode() in result.stdout.split()
             
         except Exception as e:
             logger.error(f"Error checking app installation on {device.serial}: {e}")
         
         return False
     
+    def _get_base_apk(self, apk_files: List[str]) -> str:
+        """Pick the base APK out of a (possibly split) APK set"""
+        for apk in apk_files:
+            if "base.apk" in apk or len(apk_files) == 1:
+                return apk
+        return apk_files[0]
+    
     async def get_package_name_from_apk(self, apk_path: str) -> Optional[str]:
         """Extract package name from APK file"""
         try:
-            # Use aapt to get package name
+            st = os.stat(apk_path)
+            cache_key = (apk_path, st.st_mtime_ns, st.st_size)
+        except OSError:
+            cache_key = None
+        
+        if cache_key in self._pkg_cache:
+            return self._pkg_cache[cache_key]
+        
+        package_name = self._parse_manifest_package(apk_path)
+        if package_name is None:
+            package_name = self._read_package_name(apk_path)
+        if package_name and cache_key:
+            self._pkg_cache[cache_key] = package_name
+        return package_name
+    
+    def _parse_manifest_package(self, apk_path: str) -> Optional[str]:
+        """Read the package attribute straight from the APK's binary AndroidManifest.xml"""
+        try:
+            with zipfile.ZipFile(apk_path) as apk:
+                data = apk.read("AndroidManifest.xml")
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return None
+        
+        try:
+            # Walk the AXML chunks: string pool first, then the <manifest> start tag
+            strings = []
+            offset = 8
+            while offset + 8 <= len(data):
+                chunk_type, header_size, chunk_size = struct.unpack_from("<HHI", data, offset)
+                if chunk_size == 0:
+                    break
+                
+                if chunk_type == 0x0001:  # RES_STRING_POOL_TYPE
+                    count, _, flags, strings_start = struct.unpack_from("<IIII", data, offset + 8)
+                    utf8 = bool(flags & 0x100)
+                    offsets = struct.unpack_from(f"<{count}I", data, offset + header_size)
+                    base = offset + strings_start
+                    for string_offset in offsets:
+                        pos = base + string_offset
+                        if utf8:
+                            # UTF-16 length then UTF-8 byte length, each 1 or 2 bytes
+                            pos += 2 if data[pos] & 0x80 else 1
+                            length = data[pos]
+                            if length & 0x80:
+                                length = ((length & 0x7F) << 8) | data[pos + 1]
+                                pos += 1
+                            pos += 1
+                            strings.append(data[pos:pos + length].decode("utf-8", errors="replace"))
+                        else:
+                            length = struct.unpack_from("<H", data, pos)[0]
+                            if length & 0x8000:
+                                length = ((length & 0x7FFF) << 16) | struct.unpack_from("<H", data, pos + 2)[0]
+                                pos += 2
+                            pos += 2
+                            strings.append(data[pos:pos + length * 2].decode("utf-16-le", errors="replace"))
+                
+                elif chunk_type == 0x0102:  # RES_XML_START_ELEMENT_TYPE
+                    ext = offset + header_size
+                    _, name_idx, attr_start, attr_size, attr_count = struct.unpack_from("<IIHHH", data, ext)
+                    if strings[name_idx] != "manifest":
+                        return None
+                    for i in range(attr_count):
+                        attr = ext + attr_start + i * attr_size
+                        _, attr_name, raw_value, _, _, data_type, value = struct.unpack_from("<IIIHBBI", data, attr)
+                        if strings[attr_name] == "package":
+                            if raw_value != 0xFFFFFFFF:
+                                return strings[raw_value]
+                            if data_type == 0x03:  # TYPE_STRING
+                                return strings[value]
+                            return None
+                    return None
+                
+                offset += chunk_size
+        except (struct.error, IndexError) as e:
+            logger.debug(f"Could not parse manifest in {apk_path}: {e}")
+        
+        return None
+    
+    def _read_package_name(self, apk_path: str) -> Optional[str]:
+        """Run aapt/aapt2 against an APK and parse its package name"""
+        if self._aapt_bin is None:
+            # aapt not found, will check after installation instead
+            return None
+        
+        try:
             result = subprocess.run(
-                ["aapt", "dump", "badging", apk_path],
+                [self._aapt_bin, "dump", "badging", apk_path],
                 capture_output=True,
-                text=True,
                 timeout=5
             )
             
             if result.returncode == 0:
-                # Parse package name from output
-                for line in result.stdout.split('\n'):
-                    if line.startswith("package:"):
-                        # Extract name='com.example.app' from the line
-                        parts = line.split()
-                        for part in parts:
-                            if part.startswith("name="):
-                                return part.split("'")[1]
-            else:
-                # Fallback: try with aapt2
-                result = subprocess.run(
-                    ["aapt2", "dump", "badging", apk_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                
-                if result.returncode == 0:
-                    for line in result.stdout.split('\n'):
-                        if line.startswith("package:"):
-                            parts = line.split()
-                            for part in parts:
-                                if part.startswith("name="):
-                                    return part.split("'")[1]
-        except FileNotFoundError:
-            # aapt not found, will check after installation instead
-            pass
+                # Extract name='com.example.app' from the package: line
+                match = _PKG_RE.search(result.stdout)
+                if match:
+                    return match.group(1).decode()
         except Exception as e:
             logger.error(f"Error extracting package name from {apk_path}: {e}")
         
         return None
     
-    async def install_apk_on_device(self, device: Device, app_name: str, apk_files: List[str], status_callback=None) -> Dict[str, any]:
+    async def _run_adb(self, serial: str, *args, timeout: int = 120) -> Tuple[int, bytes, bytes]:
+        """Run an adb command against a device and return raw (returncode, stdout, stderr)"""
+        process = await asyncio.create_subprocess_exec(
+            "adb", "-s", serial, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Kill the process to prevent zombie
+            try:
+                process.kill()
+                await process.wait()  # Ensure process is properly reaped
+            except ProcessLookupError:
+                pass  # Process already terminated
+            raise
+        
+        return process.returncode, stdout or b"", stderr or b""
+    
+    async def _install_split_session(self, serial: str, apk_files: List[str]) -> Tuple[int, bytes, bytes]:
+        """Install split APKs through a pm install session, streaming the splits in parallel"""
+        sizes = [os.path.getsize(apk) for apk in apk_files]
+        
+        returncode, stdout, stderr = await self._run_adb(
+            serial, "shell", "pm", "install-create", "-S", str(sum(sizes)), "-r", "-g", timeout=30
+        )
+        match = re.search(rb"\[(\d+)\]", stdout)
+        if not match:
+            return returncode or 1, stdout, stderr
+        
+        session_id = match.group(1).decode()
+        committed = False
+        
+        try:
+            for code, out, err in await asyncio.gather(*(
+                self._stream_split(serial, session_id, idx, apk, size)
+                for idx, (apk, size) in enumerate(zip(apk_files, sizes))
+            )):
+                # exec-in only carries stdin, so the exit code is the write's result;
+                # install-commit reports whether the session as a whole is valid
+                if code != 0:
+                    return code, out, err
+            
+            returncode, stdout, stderr = await self._run_adb(serial, "shell", "pm", "install-commit", session_id)
+            committed = returncode == 0 and b"Success" in stdout
+            return returncode, stdout, stderr
+        finally:
+            if not committed:
+                try:
+                    await self._run_adb(serial, "shell", "pm", "install-abandon", session_id, timeout=10)
+                except Exception as e:
+                    logger.debug(f"Failed to abandon install session {session_id} on {serial}: {e}")
+    
+    async def _stream_split(self, serial: str, session_id: str, idx: int, apk_path: str, size: int) -> Tuple[int, bytes, bytes]:
+        """Stream one split straight into pm install-write over adb exec-in"""
+        process = await asyncio.create_subprocess_exec(
+            "adb", "-s", serial, "exec-in", "pm", "install-write", "-S", str(size), session_id, str(idx), "-",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        try:
+            async with aiofiles.open(apk_path, "rb") as apk:
+                while chunk := await apk.read(1024 * 1024):
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            process.stdin.close()
+            stdout, stderr = await process.communicate()
+        except BaseException:
+            # Kill the process to prevent zombie
+            try:
+                process.kill()
+                await process.wait()  # Ensure process is properly reaped
+            except ProcessLookupError:
+                pass  # Process already terminated
+            raise
+        
+        return process.returncode, stdout or b"", stderr or b""
+    
+    async def install_apk_on_device(self, device: Device, app_name: str, apk_files: List[str], status_callback=None, package_name: Optional[str] = None, skip_precheck: bool = True) -> Dict[str, any]:
         """Install APK(s) on a single device"""
+        if self._install_sem is None:
+            self._install_sem = asyncio.Semaphore(self._install_limit)
+        
+        async with self._install_sem:
+            return await self._install_apk_on_device(device, app_name, apk_files, status_callback, package_name, skip_precheck)
+    
+    async def _install_apk_on_device(self, device: Device, app_name: str, apk_files: List[str], status_callback=None, package_name: Optional[str] = None, skip_precheck: bool = True) -> Dict[str, any]:
+        """Install APK(s) on a single device, assuming an install slot is held"""
         result = {
             'success': False,
             'already_installed': False,
@@ -117,21 +316,15 @@ class LocalAPKInstaller:
                 await update_status("No APK files")
                 return result
             
-            # Get package name from base APK
-            base_apk = None
-            for apk in apk_files:
-                if "base.apk" in apk or len(apk_files) == 1:
-                    base_apk = apk
-                    break
-            
-            if not base_apk:
-                base_apk = apk_files[0]
-            
-            await update_status("Checking package info...")
-            package_name = await self.get_package_name_from_apk(base_apk)
+            # The pre-check is opt-in (skip_precheck=False): by default the install's own
+            # ALREADY_EXISTS handling covers it, saving an aapt run and a pm query per device.
+            # Get package name from base APK unless the caller already resolved it.
+            if not package_name and not skip_precheck:
+                await update_status("Checking package info...")
+                package_name = await self.get_package_name_from_apk(self._get_base_apk(apk_files))
             
             # Check if already installed (if we have package name)
-            if package_name:
+            if package_name and not skip_precheck:
                 await update_status("Checking if installed...")
                 if await self.check_app_installed(device, package_name):
                     result['already_installed'] = True
@@ -139,71 +332,52 @@ class LocalAPKInstaller:
                     await update_status("Already installed")
                     return result
             
-            # Prepare installation command
-            await update_status("Preparing installation...")
-            
-            if len(apk_files) > 1:
-                # Use install-multiple for split APKs
-                cmd = ["adb", "-s", device.serial, "install-multiple", "-r", "-g"] + apk_files
-                logger.debug(f"Installing split APKs for {app_name} on {device.serial}")
-            else:
-                # Use regular install for single APK
-                cmd = ["adb", "-s", device.serial, "install", "-r", "-g", apk_files[0]]
-                logger.debug(f"Installing single APK for {app_name} on {device.serial}")
-            
             # Execute installation
             await update_status("Installing APK...")
-            logger.debug(f"Running command: {' '.join(cmd)}")
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
             
             # Monitor installation with timeout
             try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), 
-                    timeout=120  # 2 minute timeout
-                )
-                
-                stdout_text = stdout.decode() if stdout else ""
-                stderr_text = stderr.decode() if stderr else ""
+                if len(apk_files) > 1:
+                    # Use an install session for split APKs so the splits upload in parallel
+                    logger.debug(f"Installing split APKs for {app_name} on {device.serial}")
+                    returncode, stdout, stderr = await asyncio.wait_for(
+                        self._install_split_session(device.serial, apk_files),
+                        timeout=120  # 2 minute timeout
+                    )
+                else:
+                    # Use regular install for single APK
+                    logger.debug(f"Installing single APK for {app_name} on {device.serial}")
+                    returncode, stdout, stderr = await self._run_adb(
+                        device.serial, "install", "-r", "-g", apk_files[0],
+                        timeout=120  # 2 minute timeout
+                    )
                 
                 # Check installation result
-                if process.returncode == 0 and "Success" in stdout_text:
+                if returncode == 0 and b"Success" in stdout:
                     result['success'] = True
                     result['message'] = "Installation successful"
                     await update_status("Installation complete!")
                     logger.debug(f"Successfully installed {app_name} on {device.serial}")
                 else:
                     # Parse error message
-                    error_msg = stderr_text or stdout_text
-                    if "ALREADY_EXISTS" in error_msg:
+                    error_msg = stderr or stdout
+                    if b"ALREADY_EXISTS" in error_msg:
                         result['already_installed'] = True
                         result['message'] = "App already installed"
                         await update_status("Already installed")
-                    elif "INSTALL_FAILED_INSUFFICIENT_STORAGE" in error_msg:
+                    elif b"INSTALL_FAILED_INSUFFICIENT_STORAGE" in error_msg:
                         result['message'] = "Insufficient storage"
                         await update_status("Storage full")
-                    elif "INSTALL_FAILED_VERSION_DOWNGRADE" in error_msg:
+                    elif b"INSTALL_FAILED_VERSION_DOWNGRADE" in error_msg:
                         result['message'] = "Version downgrade"
                         await update_status("Version conflict")
                     else:
-                        result['message'] = f"Installation failed: {error_msg[:50]}"
+                        result['message'] = f"Installation failed: {error_msg[:50].decode(errors='replace')}"
                         await update_status("Installation failed")
                     
-                    logger.error(f"Failed to install {app_name} on {device.serial}: {error_msg}")
+                    logger.error(f"Failed to install {app_name} on {device.serial}: {error_msg[:500].decode(errors='replace')}")
                     
             except asyncio.TimeoutError:
-                # Kill the process to prevent zombie
-                try:
-                    process.kill()
-                    await process.wait()  # Ensure process is properly reaped
-                except ProcessLookupError:
-                    pass  # Process already terminated
-                
                 result['message'] = "Installation timeout"
                 await update_status("Installation timeout")
                 logger.error(f"Installation timeout for {app_name} on {device.serial}")
@@ -215,10 +389,15 @@ class LocalAPKInstaller:
         
         return result
     
-    async def install_app_on_devices(self, app_name: str, apk_files: List[str], devices: List[Device], progress_callback=None) -> List[Dict]:
+    async def install_app_on_devices(self, app_name: str, apk_files: List[str], devices: List[Device], progress_callback=None, skip_precheck: bool = True) -> List[Dict]:
         """Install an app on multiple devices in parallel"""
         results = []
         
+        # Resolve the package name once instead of once per device
+        package_name = None
+        if apk_files and not skip_precheck:
+            package_name = await self.get_package_name_from_apk(self._get_base_apk(apk_files))
+        
         # Install on all devices in parallel
         tasks = []
         for device in devices:
@@ -226,9 +405,9 @@ class LocalAPKInstaller:
             if progress_callback:
                 async def device_status_callback(status, dev=device):
                     await progress_callback(dev.serial, status)
-                tasks.append(self.install_apk_on_device(device, app_name, apk_files, device_status_callback))
+                tasks.append(self.install_apk_on_device(device, app_name, apk_files, device_status_callback, package_name=package_name, skip_precheck=skip_precheck))
             else:
-                tasks.append(self.install_apk_on_device(device, app_name, apk_files))
+                tasks.append(self.install_apk_on_device(device, app_name, apk_files, package_name=package_name, skip_precheck=skip_precheck))
         
         try:
             results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,110 @@
+"""Persistent adb shell sessions to avoid spawning adb for every command"""
+
+import asyncio
+import weakref
+from typing import Dict, Optional, Tuple
+from loguru import logger
+
+
+class PersistentShell:
+    """A long-lived `adb -s <serial> shell` that runs commands one at a time"""
+
+    # Printed after every command as "\n__DONE__:<exit code>\n"
+    MARKER = b"\n__DONE__:"
+
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_started(self):
+        """Start (or restart) the shell process"""
+        if self.process is None or self.process.returncode is not None:
+            self.process = await asyncio.create_subprocess_exec(
+                "adb", "-s", self.serial, "shell",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                limit=16 * 1024 * 1024  # room for large outputs like UI dumps
+            )
+
+    async def run(self, command: str, timeout: float = 30) -> Tuple[int, str]:
+        """Run a command in the session and return (returncode, stdout)"""
+        async with self._lock:
+            await self._ensure_started()
+
+            try:
+                self.process.stdin.write(f"{command}\nprintf '\\n__DONE__:%s\\n' $?\n".encode())
+                await self.process.stdin.drain()
+                data = await asyncio.wait_for(self.process.stdout.readuntil(self.MARKER), timeout)
+                status = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+            except BaseException:
+                # The session is in an unknown state; drop it so the next call starts fresh
+                await self.close()
+                raise
+
+            return int(status.strip() or 1), data[:-len(self.MARKER)].decode(errors="replace")
+
+    async def close(self):
+        """Stop the shell process"""
+        process, self.process = self.process, None
+        if process and process.returncode is None:
+            try:
+                process.kill()
+                await process.wait()
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        """Kill the shell process without waiting (safe outside the event loop)"""
+        if self.process and self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+
+class PersistentShellPool:
+    """One persistent shell per device serial"""
+
+    # Every live pool, so exit handlers can tear them all down
+    _pools = weakref.WeakSet()
+
+    def __init__(self):
+        self._shells: Dict[str, PersistentShell] = {}
+        PersistentShellPool._pools.add(self)
+
+    def get(self, serial: str) -> PersistentShell:
+        """Get the shell for a device, creating it on first use"""
+        shell = self._shells.get(serial)
+        if shell is None:
+            shell = self._shells[serial] = PersistentShell(serial)
+        return shell
+
+    async def run(self, serial: str, command: str, timeout: float = 30) -> Tuple[int, str]:
+        """Run a command in a device's persistent shell"""
+        return await self.get(serial).run(command, timeout)
+
+    async def close_serial(self, serial: str):
+        """Close one device's shell, e.g. once it is addressed under a new serial"""
+        shell = self._shells.pop(serial, None)
+        if shell:
+            await shell.close()
+    
+    async def close(self):
+        """Close every shell in the pool"""
+        shells, self._shells = list(self._shells.values()), {}
+        await asyncio.gather(*(shell.close() for shell in shells), return_exceptions=True)
+
+    def terminate(self):
+        """Kill every shell in the pool without waiting"""
+        for shell in self._shells.values():
+            shell.terminate()
+        self._shells.clear()
+
+    @classmethod
+    def terminate_all(cls):
+        """Kill the shells of every live pool"""
+        for pool in list(cls._pools):
+            pool.terminate()
+        logger.debug("Persistent adb shells closed")
@@ -0,0 +1,55 @@
+"""Small shared helpers for the standalone scripts"""
+
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+
+# Resolved once: an absolute executable (together with close_fds=False) lets
+# subprocess spawn adb with posix_spawn instead of fork/exec, and skips the PATH lookup
+ADB = shutil.which("adb") or "adb"
+
+# Devices worked on at once by run_on_all_devices; more threads just queue on the adb server
+MAX_DEVICE_WORKERS = min(16, 2 * (os.cpu_count() or 1))
+
+# Keeps lines from parallel device workers from interleaving
+print_lock = threading.Lock()
+
+
+def adb_argv(args: List[str], serial: Optional[str] = None) -> List[str]:
+    """Build an adb argv, scoped to one device when a serial is given"""
+    if serial:
+        return [ADB, "-s", serial, *args]
+    return [ADB, *args]
+
+
+def run_adb_command(args: List[str], serial: Optional[str] = None,
+                    timeout: float = 30, capture: bool = True) -> subprocess.CompletedProcess:
+    """Run an adb command and return the completed process (text output)"""
+    # Callers that only need the exit code skip buffering the output
+    stream = subprocess.PIPE if capture else subprocess.DEVNULL
+    # text=True also normalizes the \r\n line endings some devices emit to \n
+    return subprocess.run(
+        adb_argv(args, serial),
+        stdout=stream,
+        stderr=stream,
+        text=True,
+        timeout=timeout,
+        # Python's own descriptors are non-inheritable already
+        close_fds=False
+    )
+
+
+def log(message: str = "", printer=print):
+    """Print a line (via printer, e.g. a rich Console.print) without tearing output from other workers"""
+    with print_lock:
+        printer(message)
+
+
+def run_on_all_devices(devices, fn, max_workers: int = MAX_DEVICE_WORKERS) -> list:
+    """Run fn(serial) for every device in parallel, returning results in device order"""
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(devices)))) as ex:
+        return list(ex.map(fn, devices))
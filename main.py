@@ -7,6 +7,7 @@ import os
 import signal
 import atexit
 import subprocess
+from importlib.util import find_spec
 from pathlib import Path
 from loguru import logger
 from rich.console import Console
@@ -15,13 +16,18 @@ import click
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from ui.terminal_interface_v2 import EnhancedTerminalInterface
-
 # Global variable to track running tasks
 _running_tasks = set()
 
 def cleanup_on_exit():
     """Cleanup function to kill ADB server and cancel tasks"""
+    try:
+        # Close persistent adb shells before the server goes away
+        from core.persistent_shell import PersistentShellPool
+        PersistentShellPool.terminate_all()
+    except:
+        pass
+    
     try:
         # Kill ADB server
         subprocess.run(["adb", "kill-server"], capture_output=True, timeout=5)
@@ -67,11 +73,9 @@ console = Console()
 
 def check_requirements():
     """Check if all requirements are installed"""
-    try:
-        import uiautomator2
-        import adb_shell
-        import rich
-    except ImportError as e:
+    # Only locate the packages; importing them here would pay their full init cost
+    missing = [module for module in ("uiautomator2", "adb_shell", "rich") if find_spec(module) is None]
+    if missing:
         console.print(f"[red]Missing required packages. Please run:[/red]")
         console.print("[yellow]pip install -r requirements.txt[/yellow]")
         sys.exit(1)
@@ -101,6 +105,13 @@ def setup():
     console.print("[cyan]Welcome to Phone Farm Device Manager Setup![/cyan]")
     console.print()
     
+    # Start ADB server in the background while we do the local setup work
+    try:
+        adb_proc = subprocess.Popen(["adb", "start-server"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        adb_proc = None
+        adb_error = e
+    
     # Create necessary directories
     os.makedirs("logs", exist_ok=True)
     os.makedirs("config", exist_ok=True)
@@ -112,17 +123,21 @@ def setup():
     check_requirements()
     console.print("[green]✓[/green] All requirements satisfied")
     
-    # Start ADB server
+    # Wait for the ADB server started above
     console.print("[yellow]Starting ADB server...[/yellow]")
-    try:
-        import subprocess
-        result = subprocess.run(["adb", "start-server"], capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            console.print("[green]✓[/green] ADB server started")
-        else:
-            console.print(f"[yellow]⚠[/yellow] ADB server may already be running")
-    except Exception as e:
-        console.print(f"[yellow]⚠[/yellow] Could not start ADB server: {e}")
+    if adb_proc is None:
+        console.print(f"[yellow]⚠[/yellow] Could not start ADB server: {adb_error}")
+    else:
+        try:
+            if adb_proc.wait(timeout=10) == 0:
+                console.print("[green]✓[/green] ADB server started")
+            else:
+                console.print(f"[yellow]⚠[/yellow] ADB server may already be running")
+        except subprocess.TimeoutExpired as e:
+            # Don't leave a hung adb client behind
+            adb_proc.kill()
+            adb_proc.wait()
+            console.print(f"[yellow]⚠[/yellow] Could not start ADB server: {e}")
     
     console.print()
     console.print("[bold green]Setup complete! Run 'python main.py run' to start the manager.[/bold green]")
@@ -133,6 +148,13 @@ def run():
     """Run the phone farm manager"""
     check_requirements()
     
+    # Imported here so commands that don't need the UI skip loading u2/adb_shell
+    from ui.terminal_interface_v2 import EnhancedTerminalInterface
+    from core.fast_startup import FastStartup
+    
+    # Cheaper child reaping when many adb processes run at once
+    FastStartup.use_pidfd_child_watcher()
+    
     # Create UI and run
     ui = EnhancedTerminalInterface()
     
@@ -156,25 +178,24 @@ def devices(device_serial):
     import subprocess
     
     if device_serial:
-        # Show specific device info
+        # Show specific device info - only fetch the four props we display
         result = subprocess.run(
-            ["adb", "-s", device_serial, "shell", "getprop"],
+            ["adb", "-s", device_serial, "shell",
+             "getprop ro.product.model; getprop ro.product.brand; "
+             "getprop ro.build.version.release; getprop ro.build.version.sdk"],
             capture_output=True,
             text=True
         )
         
         if result.returncode == 0:
-            props = {}
-            for line in result.stdout.split('\n'):
-                if ':' in line:
-                    key, value = line.strip().replace('[', '').replace(']', '').split(': ')
-                    props[key] = value
+            values = (result.stdout.splitlines() + [""] * 4)[:4]
+            model, brand, release, sdk = (value.strip() or 'Unknown' for value in values)
             
             console.print(f"\n[bold cyan]Device: {device_serial}[/bold cyan]")
-            console.print(f"Model: {props.get('ro.product.model', 'Unknown')}")
-            console.print(f"Brand: {props.get('ro.product.brand', 'Unknown')}")
-            console.print(f"Android: {props.get('ro.build.version.release', 'Unknown')}")
-            console.print(f"SDK: {props.get('ro.build.version.sdk', 'Unknown')}")
+            console.print(f"Model: {model}")
+            console.print(f"Brand: {brand}")
+            console.print(f"Android: {release}")
+            console.print(f"SDK: {sdk}")
         else:
             console.print(f"[red]Failed to get info for device {device_serial}[/red]")
     else:
@@ -1,57 +1,136 @@
 #!/usr/bin/env python3
 """Allowlist-based cleanup - Remove everything NOT on the allowlist"""
 
+import argparse
+import asyncio
+import re
 import subprocess
 import sys
-import time
 from pathlib import Path
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config.allowlist import get_full_allowlist, should_remove
+from core.persistent_shell import PersistentShell
+from core.utils import MAX_DEVICE_WORKERS
 
-def run_command(cmd):
-    """Run a shell command and return the result"""
+# Parallel pm sessions used for removal, sized like every other adb fan-out
+MAX_WORKERS = MAX_DEVICE_WORKERS
+
+# Seconds to wait for each pm command on the device
+COMMAND_TIMEOUT = 30
+
+# Display categories for packages being removed. Each branch is an anchored
+# lookahead so the first matching category wins (games before social before
+# samsung ...), and the empty named group tells us which one matched.
+CATEGORY_RE = re.compile(
+    r"^(?:"
+    r"(?=.*(?:game|solitaire|puzzle|candy|monopoly))(?P<games>)"
+    r"|(?=.*(?:facebook|instagram|twitter|tiktok|whatsapp))(?P<social>)"
+    r"|(?=.*samsung)(?!.*(?:provider|core|system))(?P<samsung>)"
+    r"|(?=.*google)(?P<google>)"
+    r"|(?=.*(?:att|verizon|tmobile|sprint))(?P<carrier>)"
+    r")"
+)
+
+def run_command(argv):
+    """Run a command (argv list, no shell) and return the result"""
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=30)
+        result = subprocess.run(argv, capture_output=True, text=True, timeout=30)
         return result.returncode == 0, result.stdout, result.stderr
     except subprocess.TimeoutExpired:
         return False, "", "Command timed out"
     except Exception as e:
         return False, "", str(e)
 
-def get_device_packages():
+def get_device_serial(devices_output):
+    """Get the serial of the first ready device from `adb devices` output"""
+    for line in devices_output.splitlines()[1:]:
+        serial, _, state = line.partition("\t")
+        if state.strip() == "device":
+            return serial
+    return None
+
+def get_device_packages(serial):
     """Get all installed packages on the device"""
-    success, stdout, stderr = run_command("adb shell pm list packages")
-    if success:
-        packages = []
-        for line in stdout.strip().split('\n'):
-            if line.startswith('package:'):
-                packages.append(line.replace('package:', '').strip())
-        return packages
-    else:
+    # Parse lines as adb streams them rather than buffering the whole listing
+    try:
+        with subprocess.Popen(
+            ["adb", "-s", serial, "shell", "pm", "list", "packages"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        ) as process:
+            # Text mode folds the \r\n some devices emit into \n, so only the newline needs dropping
+            packages = [line[8:].rstrip('\n') for line in process.stdout if line.startswith('package:')]
+            stderr = process.stderr.read()
+    except Exception as e:
+        print(f"Error getting packages: {e}")
+        return []
+    
+    if process.returncode != 0:
         print(f"Error getting packages: {stderr}")
         return []
+    return packages
 
-def uninstall_package(package):
+async def uninstall_package(shell, package):
     """Attempt to uninstall a package"""
-    # Try uninstall for user 0
-    success, stdout, stderr = run_command(f"adb shell pm uninstall --user 0 {package}")
-    if success or "Success" in stdout:
-        return True, "uninstalled"
-    
-    # Try to disable
-    success, stdout, stderr = run_command(f"adb shell pm disable-user --user 0 {package}")
-    if success or "disabled" in stdout.lower():
-        return True, "disabled"
-    
-    # Try to hide
-    success, stdout, stderr = run_command(f"adb shell pm hide {package}")
-    if success or "hidden" in stdout.lower():
-        return True, "hidden"
-    
-    return False, stderr if stderr else "failed"
+    try:
+        # Try uninstall for user 0
+        returncode, output = await shell.run(f"pm uninstall --user 0 {package} 2>&1", timeout=COMMAND_TIMEOUT)
+        if returncode == 0 or "Success" in output:
+            return True, "uninstalled"
+        
+        # Try to disable
+        returncode, output = await shell.run(f"pm disable-user --user 0 {package} 2>&1", timeout=COMMAND_TIMEOUT)
+        if returncode == 0 or "disabled" in output.lower():
+            return True, "disabled"
+        
+        # Try to hide
+        returncode, output = await shell.run(f"pm hide {package} 2>&1", timeout=COMMAND_TIMEOUT)
+        if returncode == 0 or "hidden" in output.lower():
+            return True, "hidden"
+    except asyncio.TimeoutError:
+        # The shell is restarted on its next use
+        return False, "timeout"
+    except Exception as e:
+        return False, f"error ({e or type(e).__name__})"
+    
+    return False, output.strip() if output.strip() else "failed"
+
+async def remove_packages(serial, to_remove, workers=MAX_WORKERS):
+    """Remove packages using a few shell sessions working off a shared queue"""
+    queue = asyncio.Queue()
+    for package in to_remove:
+        queue.put_nowait(package)
+    
+    results = []
+    total = len(to_remove)
+    
+    async def worker():
+        # One shell session per worker instead of a new adb process per command
+        shell = PersistentShell(serial)
+        try:
+            while not queue.empty():
+                package = queue.get_nowait()
+                success, status = await uninstall_package(shell, package)
+                results.append((package, success, status))
+                
+                i = len(results)
+                if success:
+                    print(f"[{i}/{total}] ✅ {status}: {package}")
+                else:
+                    print(f"[{i}/{total}] ❌ Failed: {package}")
+                
+                # Progress indicator
+                if i % 10 == 0:
+                    print(f"\n  Progress: {i}/{total} ({i*100//total}%)\n")
+        finally:
+            await shell.close()
+    
+    await asyncio.gather(*(worker() for _ in range(min(workers, total))))
+    return results
 
 def categorize_packages(packages, allowlist):
     """Categorize packages into keep and remove lists"""
@@ -66,7 +145,7 @@ def categorize_packages(packages, allowlist):
     
     return to_keep, to_remove
 
-def main():
+def main(verify=False):
     print("=" * 70)
     print("ALLOWLIST-BASED CLEANUP SCRIPT")
     print("=" * 70)
@@ -74,15 +153,16 @@ def main():
     print("Only essential system apps and specified apps will remain.")
     
     # Check if device is connected
-    success, stdout, stderr = run_command("adb devices")
-    if not success or "device" not in stdout:
+    success, stdout, stderr = run_command(["adb", "devices"])
+    serial = get_device_serial(stdout) if success else None
+    if not serial:
         print("\n❌ No device connected. Please connect a device first.")
         sys.exit(1)
     
     print("\n✅ Device connected. Analyzing installed packages...")
     
     # Get all installed packages
-    installed_packages = get_device_packages()
+    installed_packages = get_device_packages(serial)
     if not installed_packages:
         print("❌ Could not get installed packages")
         sys.exit(1)
@@ -107,27 +187,17 @@ def main():
         print("=" * 70)
         
         # Categorize for better visibility
-        games = []
-        social = []
-        samsung_bloat = []
-        google_bloat = []
-        carrier = []
-        other = []
-        
+        categories = {"games": [], "social": [], "samsung": [], "google": [], "carrier": [], "other": []}
         for pkg in to_remove:
-            pkg_lower = pkg.lower()
-            if any(g in pkg_lower for g in ["game", "solitaire", "puzzle", "candy", "monopoly"]):
-                games.append(pkg)
-            elif any(s in pkg_lower for s in ["facebook", "instagram", "twitter", "tiktok", "whatsapp"]):
-                social.append(pkg)
-            elif "samsung" in pkg_lower and not any(e in pkg_lower for e in ["provider", "core", "system"]):
-                samsung_bloat.append(pkg)
-            elif "google" in pkg_lower and pkg not in allowlist:
-                google_bloat.append(pkg)
-            elif any(c in pkg_lower for c in ["att", "verizon", "tmobile", "sprint"]):
-                carrier.append(pkg)
-            else:
-                other.append(pkg)
+            match = CATEGORY_RE.match(pkg.lower())
+            categories[match.lastgroup if match else "other"].append(pkg)
+        
+        games = categories["games"]
+        social = categories["social"]
+        samsung_bloat = categories["samsung"]
+        google_bloat = categories["google"]
+        carrier = categories["carrier"]
+        other = categories["other"]
         
         if games:
             print(f"\n🎮 Games ({len(games)}):")
@@ -181,27 +251,11 @@ def main():
     print("REMOVING PACKAGES...")
     print("=" * 70)
     
-    success_count = 0
-    failed_count = 0
-    failed_packages = []
+    results = asyncio.run(remove_packages(serial, to_remove))
     
-    total = len(to_remove)
-    for i, package in enumerate(to_remove, 1):
-        print(f"\n[{i}/{total}] Processing: {package}")
-        success, status = uninstall_package(package)
-        if success:
-            print(f"  ✅ {status}: {package}")
-            success_count += 1
-        else:
-            print(f"  ❌ Failed: {package}")
-            failed_count += 1
-            failed_packages.append((package, status))
-        
-        # Progress indicator
-        if i % 10 == 0:
-            print(f"\n  Progress: {i}/{total} ({i*100//total}%)")
-        
-        time.sleep(0.1)  # Small delay to prevent overwhelming the system
+    success_count = sum(1 for _, success, _ in results if success)
+    failed_packages = [(package, status) for package, success, status in results if not success]
+    failed_count = len(failed_packages)
     
     # Summary
     print("\n" + "=" * 70)
@@ -223,7 +277,12 @@ def main():
     print("=" * 70)
     print("Checking remaining packages...")
     
-    remaining = get_device_packages()
+    # We already know what was removed; only re-query the device when asked to
+    if verify:
+        remaining = get_device_packages(serial)
+    else:
+        removed = {package for package, success, _ in results if success}
+        remaining = [pkg for pkg in installed_packages if pkg not in removed]
     print(f"\n📦 Total packages remaining: {len(remaining)}")
     
     # Check for any games/bloatware that might still be there
@@ -246,4 +305,8 @@ def main():
     print("=" * 70)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Remove every app that is not on the allowlist")
+    parser.add_argument("--verify", action="store_true",
+                        help="re-list packages from the device for the final verification")
+    args = parser.parse_args()
+    main(verify=args.verify)
\ No newline at end of file
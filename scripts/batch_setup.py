@@ -2,10 +2,13 @@
 """Batch setup script for phone farm - non-interactive mode"""
 
 import asyncio
+import os
 import sys
+import time
 from pathlib import Path
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
+from loguru import logger
 import click
 
 sys.path.insert(0, str(Path(__file__).parent))
@@ -13,115 +16,135 @@ sys.path.insert(0, str(Path(__file__).parent))
 from core.device_manager import DeviceManager
 from core.device_configurator import DeviceConfigurator  
 from core.app_manager import AppManager
+from core.fast_startup import FastStartup
 
 console = Console()
 
-async def run_complete_setup():
+# Default cap on devices worked concurrently, so the adb server and USB host aren't flooded
+DEFAULT_MAX_CONCURRENCY = min(16, 2 * (os.cpu_count() or 1))
+
+
+async def run_on_devices(devices, worker, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """Run worker(device) on all devices concurrently, yielding (device, result, error) as each finishes"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    durations = []
+    
+    async def run_one(device):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                return device, await worker(device), None
+            except Exception as e:
+                return device, None, e
+            finally:
+                durations.append(time.perf_counter() - start)
+    
+    for next_done in asyncio.as_completed([run_one(device) for device in devices]):
+        yield await next_done
+    
+    # Per-device latency spread, for tuning --max-concurrency
+    if durations:
+        durations.sort()
+        logger.debug(
+            f"{getattr(worker, '__name__', 'worker')}: {len(durations)} devices at concurrency {max_concurrency}, "
+            f"p50 {durations[len(durations) // 2]:.2f}s, "
+            f"p99 {durations[min(len(durations) - 1, len(durations) * 99 // 100)]:.2f}s, "
+            f"max {durations[-1]:.2f}s"
+        )
+
+async def run_complete_setup(max_concurrency=DEFAULT_MAX_CONCURRENCY):
     """Run complete setup on all connected devices"""
     
     console.print("\n[bold cyan]📱 Phone Farm Batch Setup[/bold cyan]\n")
     
     # Initialize managers
     device_manager = DeviceManager()
-    configurator = DeviceConfigurator()
+    configurator = DeviceConfigurator(device_manager.shell_pool)
     app_manager = AppManager()
     
-    # Scan for devices
-    console.print("[yellow]Scanning for devices...[/yellow]")
-    devices = await device_manager.scan_devices()
-    
-    if not devices:
-        console.print("[red]No devices found! Please connect devices and enable USB debugging.[/red]")
-        return
-    
-    console.print(f"[green]Found {len(devices)} device(s)[/green]\n")
-    
-    # Connect to all devices
-    console.print("[yellow]Connecting to devices...[/yellow]")
-    connected_count = await device_manager.connect_all_devices()
-    
-    if connected_count == 0:
-        console.print("[red]Failed to connect to any devices[/red]")
-        return
+    try:
+        # Scan for devices, connecting to each one as soon as it shows up
+        console.print("[yellow]Scanning and connecting to devices...[/yellow]")
+        connected_count = await device_manager.scan_and_connect()
         
-    console.print(f"[green]Connected to {connected_count} device(s)[/green]\n")
-    
-    connected_devices = device_manager.get_connected_devices()
-    
-    # Step 1: Configure Security
-    console.rule("[bold]Step 1: Security Configuration[/bold]")
-    
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-        console=console
-    ) as progress:
+        if not device_manager.devices:
+            console.print("[red]No devices found! Please connect devices and enable USB debugging.[/red]")
+            return
         
-        main_task = progress.add_task("[cyan]Configuring security...", total=len(connected_devices))
+        console.print(f"[green]Found {len(device_manager.devices)} device(s)[/green]\n")
         
-        for device in connected_devices:
-            device_task = progress.add_task(f"[yellow]{device.serial}", total=9)
-            
-            # Run security configurations
-            results = await configurator.configure_device_security(device)
-            
-            for setting, success in results.items():
-                progress.update(device_task, advance=1)
-                status = "✓" if success else "✗"
-                color = "green" if success else "red"
-                console.print(f"  [{color}]{status}[/{color}] {setting}")
+        if connected_count == 0:
+            console.print("[red]Failed to connect to any devices[/red]")
+            return
             
-            progress.update(main_task, advance=1)
-            progress.remove_task(device_task)
-    
-    # Step 2: Disable Auto-Updates
-    console.rule("[bold]Step 2: Disable Auto-Updates[/bold]")
-    
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-        console=console
-    ) as progress:
+        console.print(f"[green]Connected to {connected_count} device(s)[/green]\n")
         
-        task = progress.add_task("[cyan]Disabling auto-updates...", total=len(connected_devices))
+        connected_devices = device_manager.get_connected_devices()
         
-        for device in connected_devices:
-            try:
-                await app_manager.disable_app_auto_update(device)
-                console.print(f"  [green]✓[/green] {device.serial}")
-            except Exception as e:
-                console.print(f"  [red]✗[/red] {device.serial}: {e}")
+        # One progress display reused across all steps
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+            console=console
+        ) as progress:
             
-            progress.update(task, advance=1)
-    
-    # Step 3: Install Super Proxy
-    console.rule("[bold]Step 3: Install Super Proxy[/bold]")
-    
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-        console=console
-    ) as progress:
-        
-        task = progress.add_task("[cyan]Installing Super Proxy...", total=len(connected_devices))
-        
-        for device in connected_devices:
-            try:
-                success = await app_manager.install_super_proxy(device)
-                if success:
+            # Step 1: Configure Security
+            console.rule("[bold]Step 1: Security Configuration[/bold]")
+            
+            task = progress.add_task("[cyan]Configuring security...", total=len(connected_devices))
+            
+            async for device, results, error in run_on_devices(connected_devices, configurator.configure_device_security,
+                                                              max_concurrency):
+                if error:
+                    console.print(f"  [red]✗[/red] {device.serial}: {error}")
+                else:
+                    console.print(f"  [yellow]{device.serial}[/yellow]")
+                    for setting, success in results.items():
+                        status = "✓" if success else "✗"
+                        color = "green" if success else "red"
+                        console.print(f"  [{color}]{status}[/{color}] {setting}")
+                
+                progress.update(task, advance=1)
+            
+            progress.remove_task(task)
+            
+            # Step 2: Disable Auto-Updates
+            console.rule("[bold]Step 2: Disable Auto-Updates[/bold]")
+            
+            task = progress.add_task("[cyan]Disabling auto-updates...", total=len(connected_devices))
+            
+            async for device, _, error in run_on_devices(connected_devices, app_manager.disable_app_auto_update,
+                                                        max_concurrency):
+                if error:
+                    console.print(f"  [red]✗[/red] {device.serial}: {error}")
+                else:
+                    console.print(f"  [green]✓[/green] {device.serial}")
+                
+                progress.update(task, advance=1)
+            
+            progress.remove_task(task)
+            
+            # Step 3: Install Super Proxy
+            console.rule("[bold]Step 3: Install Super Proxy[/bold]")
+            
+            task = progress.add_task("[cyan]Installing Super Proxy...", total=len(connected_devices))
+            
+            async for device, success, error in run_on_devices(connected_devices, app_manager.install_super_proxy,
+                                                              max_concurrency):
+                if error:
+                    console.print(f"  [red]✗[/red] {device.serial}: {error}")
+                elif success:
                     console.print(f"  [green]✓[/green] {device.serial}")
                 else:
                     console.print(f"  [red]✗[/red] {device.serial}: Installation failed")
-            except Exception as e:
-                console.print(f"  [red]✗[/red] {device.serial}: {e}")
+                
+                progress.update(task, advance=1)
             
-            progress.update(task, advance=1)
+            progress.remove_task(task)
+    finally:
+        await device_manager.shell_pool.close()
     
     # Summary
     console.rule("[bold]Setup Complete[/bold]")
@@ -132,7 +155,9 @@ async def run_complete_setup():
 @click.command()
 @click.option('--security-only', is_flag=True, help='Only configure security settings')
 @click.option('--apps-only', is_flag=True, help='Only install apps')
-def main(security_only, apps_only):
+@click.option('--max-concurrency', type=click.IntRange(min=1), default=DEFAULT_MAX_CONCURRENCY, show_default=True,
+              help='Devices worked on at once (tune to the host USB controllers)')
+def main(security_only, apps_only, max_concurrency):
     """Run batch setup on all connected devices"""
     
     if security_only:
@@ -142,8 +167,11 @@ def main(security_only, apps_only):
     else:
         console.print("[cyan]Running complete setup...[/cyan]")
     
+    # Cheaper child reaping when many adb processes run at once
+    FastStartup.use_pidfd_child_watcher()
+    
     try:
-        asyncio.run(run_complete_setup())
+        asyncio.run(run_complete_setup(max_concurrency))
     except KeyboardInterrupt:
         console.print("\n[yellow]Setup interrupted by user[/yellow]")
         sys.exit(1)
@@ -9,6 +9,39 @@ from core.device_manager import DeviceManager
 
 console = Console()
 
+# Settings to report, with the command that reads each one
+CHECKS = {
+    "Bluetooth": "settings get global bluetooth_on",
+    "Mobile Data": "settings get global mobile_data",
+    "WiFi Direct": "settings get global wifi_direct_auto_accept",
+    "NFC": "settings get secure nfc_on",
+    "Location": "settings get secure location_mode",
+    "Backup": "settings get secure backup_enabled",
+    "Ad Tracking": "settings get secure limit_ad_tracking",
+    "Auto Update": "settings get global auto_update_policy"
+}
+
+# Read every setting in one adb round-trip, one "Setting=value" line each
+CHECK_SCRIPT = "; ".join(f'echo "{setting}=$({command})"' for setting, command in CHECKS.items())
+
+async def read_device_status(manager, device):
+    """Read settings and proxy packages from one device, returning (values, error, proxy_output)"""
+    try:
+        output = await manager.execute_adb_command(device, CHECK_SCRIPT) or ""
+        values = dict(line.split("=", 1) for line in output.splitlines() if "=" in line)
+        error = None
+    except Exception as e:
+        values = {}
+        error = str(e)
+    
+    # Guarded too, so one failing device can't abort the report for every device
+    try:
+        proxy_output = await manager.execute_adb_command(device, "pm list packages | grep -i proxy")
+    except Exception as e:
+        proxy_output = None
+        error = error or str(e)
+    return values, error, proxy_output
+
 async def check_device_status():
     """Check security settings status"""
     
@@ -16,40 +49,34 @@ async def check_device_status():
     
     # Initialize device manager
     manager = DeviceManager()
-    devices = await manager.scan_devices()
-    
-    if not devices:
-        console.print("[red]No devices found[/red]")
-        return
     
-    # Connect to devices
-    await manager.connect_all_devices()
-    connected = manager.get_connected_devices()
-    
-    for device in connected:
-        console.print(f"\n[bold yellow]Device: {device.serial} ({device.model})[/bold yellow]")
+    try:
+        # Scan and connect in one pass, connecting to each device as soon as it is listed
+        await manager.scan_and_connect()
         
-        # Check various settings
-        checks = {
-            "Bluetooth": "settings get global bluetooth_on",
-            "Mobile Data": "settings get global mobile_data",
-            "WiFi Direct": "settings get global wifi_direct_auto_accept",
-            "NFC": "settings get secure nfc_on",
-            "Location": "settings get secure location_mode",
-            "Backup": "settings get secure backup_enabled",
-            "Ad Tracking": "settings get secure limit_ad_tracking",
-            "Auto Update": "settings get global auto_update_policy"
-        }
+        if not manager.devices:
+            console.print("[red]No devices found[/red]")
+            return
         
-        table = Table(show_header=True, header_style="bold magenta")
-        table.add_column("Setting", width=20)
-        table.add_column("Status", width=15)
-        table.add_column("Value", width=10)
+        connected = manager.get_connected_devices()
         
-        for setting, command in checks.items():
-            try:
-                result = await manager.execute_adb_command(device, command)
-                if result:
+        # Query every device at once, then print the reports in order
+        statuses = await asyncio.gather(*(read_device_status(manager, device) for device in connected))
+        
+        for device, (values, error, proxy_output) in zip(connected, statuses):
+            console.print(f"\n[bold yellow]Device: {device.serial} ({device.model})[/bold yellow]")
+            
+            table = Table(show_header=True, header_style="bold magenta")
+            table.add_column("Setting", width=20)
+            table.add_column("Status", width=15)
+            table.add_column("Value", width=10)
+            
+            if error:
+                console.print(f"[red]Error reading device: {error[:50]}[/red]")
+            
+            for setting in CHECKS:
+                result = values.get(setting)
+                if result is not None:
                     value = result.strip()
                     
                     # Interpret the value
@@ -69,21 +96,20 @@ async def check_device_status():
                     table.add_row(setting, f"[{color}]{status}[/{color}]", value or "null")
                 else:
                     table.add_row(setting, "[red]Error[/red]", "-")
-            except Exception as e:
-                table.add_row(setting, "[red]Error[/red]", str(e)[:10])
-        
-        console.print(table)
-        
-        # Check installed apps
-        console.print("\n[cyan]Checking for Super Proxy app...[/cyan]")
-        result = await manager.execute_adb_command(device, "pm list packages | grep -i proxy")
-        if result:
-            console.print("[green]✓ Proxy-related packages found:[/green]")
-            for line in result.strip().split('\n'):
-                if line:
-                    console.print(f"  • {line}")
-        else:
-            console.print("[yellow]⚠️ No proxy packages found[/yellow]")
+            
+            console.print(table)
+            
+            # Check installed apps
+            console.print("\n[cyan]Checking for Super Proxy app...[/cyan]")
+            if proxy_output:
+                console.print("[green]✓ Proxy-related packages found:[/green]")
+                for line in proxy_output.strip().split('\n'):
+                    if line:
+                        console.print(f"  • {line}")
+            else:
+                console.print("[yellow]⚠️ No proxy packages found[/yellow]")
+    finally:
+        await manager.shell_pool.close()
 
 if __name__ == "__main__":
     try:
@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
-"""Non-interactive allowlist cleanup - Automatically removes all non-essential apps"""
+"""Non-interactive allowlist cleanup - Automatically removes all non-essential apps (--interactive to confirm first)"""
 
+import argparse
+import asyncio
+import re
 import subprocess
 import sys
-import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.persistent_shell import PersistentShell
+
+# Seconds to wait for each pm command on the device
+UNINSTALL_TIMEOUT = 30
 
 # ESSENTIAL APPS ONLY - Minimal set for a working phone
-ESSENTIAL_ALLOWLIST = [
+ESSENTIAL_ALLOWLIST = frozenset({
     # Core Android System - NEVER REMOVE
     "android",
     "com.android.systemui",
@@ -63,102 +74,187 @@ ESSENTIAL_ALLOWLIST = [
     
     # Browser (keep one)
     "com.android.chrome",
-]
+})
+
+# Prefixes of packages that must never be touched
+CRITICAL_PREFIXES = (
+    "android.auto_generated",
+    "com.android.cts",
+    "com.android.internal",
+    "com.android.overlay",
+    "com.samsung.internal",
+    "com.google.android.overlay",
+    "com.sec.factory",
+    "com.sec.imsservice",
+    "com.samsung.ipservice",
+)
+
+def keyword_re(*keywords):
+    """Compile keywords into one alternation regex"""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+# Keyword matchers, applied to lowercased package names
+_GAMES_RE = keyword_re("game", "solitaire", "puzzle", "monopoly", "candy")
+_SOCIAL_RE = keyword_re("facebook", "instagram", "twitter", "tiktok")
+_IMPORTANT_RE = keyword_re("game", "facebook", "instagram", "cash", "monopoly")
+_REMAINING_GAMES_RE = keyword_re("game", "solitaire", "monopoly", "candy")
 
-def run_command(cmd):
-    """Run a shell command and return the result"""
+# Categories reported for packages that will be removed
+CATEGORY_RES = {
+    "games": _GAMES_RE,
+    "social": _SOCIAL_RE,
+    "samsung": keyword_re("samsung"),
+    "google": keyword_re("google"),
+    "att": keyword_re("att"),
+}
+
+def run_command(argv):
+    """Run a command (argv list, no shell) and return the result"""
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=30)
+        result = subprocess.run(argv, capture_output=True, text=True, timeout=30)
         return result.returncode == 0, result.stdout, result.stderr
     except Exception as e:
         return False, "", str(e)
 
-def get_device_packages():
+def get_device_serial(devices_output):
+    """Get the serial of the first ready device from `adb devices` output"""
+    for line in devices_output.splitlines()[1:]:
+        serial, _, state = line.partition("\t")
+        if state.strip() == "device":
+            return serial
+    return None
+
+def iter_device_packages(serial):
+    """Yield installed packages as adb streams them"""
+    try:
+        with subprocess.Popen(
+            ["adb", "-s", serial, "shell", "pm", "list", "packages"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        ) as process:
+            for line in process.stdout:
+                if line.startswith("package:"):
+                    # len("package:") == 8; text mode has already folded any \r\n into \n
+                    yield line[8:].rstrip("\n")
+    except OSError:
+        return
+
+def get_device_packages(serial):
     """Get all installed packages on the device"""
-    success, stdout, stderr = run_command("adb shell pm list packages")
-    if success:
-        packages = []
-        for line in stdout.strip().split('\n'):
-            if line.startswith('package:'):
-                packages.append(line.replace('package:', '').strip())
-        return packages
-    return []
-
-def uninstall_package(package):
+    return list(iter_device_packages(serial))
+
+async def uninstall_package(shell, package):
     """Attempt to uninstall a package"""
-    # Try uninstall for user 0
-    success, stdout, stderr = run_command(f"adb shell pm uninstall --user 0 {package}")
-    if success or "Success" in stdout:
-        return True, "uninstalled"
-    
-    # Try to disable
-    success, stdout, stderr = run_command(f"adb shell pm disable-user --user 0 {package}")
-    if success or "disabled" in stdout.lower():
-        return True, "disabled"
+    try:
+        # Try uninstall for user 0
+        returncode, output = await shell.run(f"pm uninstall --user 0 {package} 2>&1", timeout=UNINSTALL_TIMEOUT)
+        if returncode == 0 or "Success" in output:
+            return True, "uninstalled"
+        
+        # Already gone for this user; disabling would just fail too
+        if "not installed for" in output:
+            return True, "not_present"
+        
+        # Try to disable
+        returncode, output = await shell.run(f"pm disable-user --user 0 {package} 2>&1", timeout=UNINSTALL_TIMEOUT)
+        if returncode == 0 or "disabled" in output.lower():
+            return True, "disabled"
+    except asyncio.TimeoutError:
+        # The shell is restarted on its next use
+        return False, "timeout"
+    except Exception as e:
+        return False, f"error ({e or type(e).__name__})"
     
     return False, "failed"
 
+async def remove_packages(serial, packages):
+    """Uninstall packages one at a time over a single persistent shell, returning (removed, not present, failed)"""
+    success_count = 0
+    absent_count = 0
+    failed_count = 0
+    
+    # One shell session for every package instead of a new adb process per command
+    shell = PersistentShell(serial)
+    try:
+        for i, package in enumerate(packages, 1):
+            # Show progress every 10 packages
+            if i % 10 == 0:
+                print(f"\nProgress: {i}/{len(packages)} ({i*100//len(packages)}%)")
+            
+            success, status = await uninstall_package(shell, package)
+            if status == "not_present":
+                # Already gone for user 0; nothing was removed
+                absent_count += 1
+            elif success:
+                success_count += 1
+                # Only show important removals
+                if _IMPORTANT_RE.search(package.lower()):
+                    print(f"  ✅ Removed: {package}")
+            else:
+                failed_count += 1
+                if status != "failed":
+                    print(f"  ❌ {package}: {status}")
+    finally:
+        await shell.close()
+    
+    return success_count, absent_count, failed_count
+
 def is_system_critical(package):
     """Check if package is absolutely critical"""
-    critical_prefixes = [
-        "android.auto_generated",
-        "com.android.cts",
-        "com.android.internal",
-        "com.android.overlay",
-        "com.samsung.internal",
-        "com.google.android.overlay",
-        "com.sec.factory",
-        "com.sec.imsservice",
-        "com.samsung.ipservice",
-    ]
-    
-    for prefix in critical_prefixes:
-        if package.startswith(prefix):
-            return True
-    return False
-
-def main():
+    return package.startswith(CRITICAL_PREFIXES)
+
+def main(interactive=False):
     print("=" * 70)
     print("AGGRESSIVE DEVICE CLEANUP - ALLOWLIST MODE")
     print("=" * 70)
     print("\n⚠️  This will remove ALL apps except essential system apps!")
     
     # Check device connection
-    success, stdout, stderr = run_command("adb devices")
-    if not success or "device" not in stdout:
+    success, stdout, stderr = run_command(["adb", "devices"])
+    serial = get_device_serial(stdout) if success else None
+    if not serial:
         print("\n❌ No device connected.")
         sys.exit(1)
     
     print("\n✅ Device connected. Analyzing packages...")
     
     # Get installed packages
-    packages = get_device_packages()
-    if not packages:
-        print("❌ Could not get packages")
-        sys.exit(1)
-    
-    print(f"📦 Found {len(packages)} total packages")
-    
-    # Determine what to remove
+    # Classify packages as they stream in instead of waiting for the full listing
+    packages = []
     to_remove = []
     to_keep = []
+    categories = {name: [] for name in CATEGORY_RES}
     
-    for package in packages:
+    for package in iter_device_packages(serial):
+        packages.append(package)
         if package in ESSENTIAL_ALLOWLIST or is_system_critical(package):
             to_keep.append(package)
-        else:
-            to_remove.append(package)
+            continue
+        
+        to_remove.append(package)
+        package_lower = package.lower()
+        for name, regex in CATEGORY_RES.items():
+            if regex.search(package_lower):
+                categories[name].append(package)
+    
+    if not packages:
+        print("❌ Could not get packages")
+        sys.exit(1)
+    
+    print(f"📦 Found {len(packages)} total packages")
     
     print(f"\n📊 Analysis complete:")
     print(f"  • Will KEEP: {len(to_keep)} essential packages")
     print(f"  • Will REMOVE: {len(to_remove)} packages")
     
     # Show categories of what will be removed
-    games = [p for p in to_remove if any(g in p.lower() for g in ["game", "solitaire", "puzzle", "monopoly", "candy"])]
-    social = [p for p in to_remove if any(s in p.lower() for s in ["facebook", "instagram", "twitter", "tiktok"])]
-    samsung = [p for p in to_remove if "samsung" in p.lower()]
-    google = [p for p in to_remove if "google" in p.lower()]
-    att = [p for p in to_remove if "att" in p.lower()]
+    games = categories["games"]
+    social = categories["social"]
+    samsung = categories["samsung"]
+    google = categories["google"]
+    att = categories["att"]
     
     if games:
         print(f"\n🎮 Games to remove: {len(games)}")
@@ -181,48 +277,34 @@ def main():
     if att:
         print(f"\n📡 AT&T apps to remove: {len(att)}")
     
-    # Countdown before starting
+    # Confirm before starting only when asked to; the default is unattended
     print("\n" + "=" * 70)
-    print("Starting removal in 5 seconds... Press Ctrl+C to cancel")
-    for i in range(5, 0, -1):
-        print(f"  {i}...")
-        time.sleep(1)
+    if interactive:
+        response = input("Proceed with removal? (yes/no): ").strip().lower()
+        if response not in ['yes', 'y']:
+            print("❌ Aborted by user")
+            return
     
     # Remove packages
     print("\n" + "=" * 70)
     print("REMOVING PACKAGES...")
     print("=" * 70)
     
-    success_count = 0
-    failed_count = 0
-    
-    for i, package in enumerate(to_remove, 1):
-        # Show progress every 10 packages
-        if i % 10 == 0:
-            print(f"\nProgress: {i}/{len(to_remove)} ({i*100//len(to_remove)}%)")
-        
-        success, status = uninstall_package(package)
-        if success:
-            success_count += 1
-            # Only show important removals
-            if any(x in package.lower() for x in ["game", "facebook", "instagram", "cash", "monopoly"]):
-                print(f"  ✅ Removed: {package}")
-        else:
-            failed_count += 1
-        
-        time.sleep(0.05)  # Small delay
+    success_count, absent_count, failed_count = asyncio.run(remove_packages(serial, to_remove))
     
     # Summary
     print("\n" + "=" * 70)
     print("CLEANUP COMPLETE!")
     print("=" * 70)
     print(f"✅ Successfully removed: {success_count} packages")
+    if absent_count:
+        print(f"ℹ️  Already removed: {absent_count} packages (not installed for user 0)")
     print(f"⚠️  Could not remove: {failed_count} packages (likely system-protected)")
     
     # Final check for games
     print("\n🔍 Final verification...")
-    remaining = get_device_packages()
-    remaining_games = [p for p in remaining if any(g in p.lower() for g in ["game", "solitaire", "monopoly", "candy"])]
+    remaining = get_device_packages(serial)
+    remaining_games = [p for p in remaining if _REMAINING_GAMES_RE.search(p.lower())]
     
     if remaining_games:
         print(f"\n⚠️  Still found {len(remaining_games)} gaming apps:")
@@ -235,8 +317,12 @@ def main():
     print("✅ Device cleanup complete!")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove every non-essential app from the connected device")
+    parser.add_argument("-i", "--interactive", action="store_true",
+                        help="ask for confirmation before removing anything")
+    args = parser.parse_args()
     try:
-        main()
+        main(interactive=args.interactive)
     except KeyboardInterrupt:
         print("\n\n❌ Cancelled by user")
         sys.exit(1)
\ No newline at end of file
@@ -7,6 +7,7 @@ import asyncio
 from rich.console import Console
 from rich.table import Table
 from core.device_manager import DeviceManager
+from core.utils import log, run_on_all_devices
 
 console = Console()
 
@@ -24,6 +25,9 @@ PHONE_FARM_APPS = {
     }
 }
 
+# (app name, package) pairs in display order
+APP_ROWS = [(app_name, app_info['package']) for app_name, app_info in PHONE_FARM_APPS.items()]
+
 def check_adb():
     """Check if ADB is available"""
     try:
@@ -48,45 +52,61 @@ def get_connected_devices():
     except:
         return []
 
-def install_apk(device_serial: str, apk_path: str) -> bool:
+async def install_apk(device_serial: str, apk_path: str) -> bool:
     """Install APK on device"""
+    log(f"[yellow]Installing {apk_path} on {device_serial}...[/yellow]", console.print)
     try:
-        console.print(f"[yellow]Installing {apk_path} on {device_serial}...[/yellow]")
-        result = subprocess.run(
-            ["adb", "-s", device_serial, "install", "-r", "-g", apk_path],
-            capture_output=True,
-            text=True,
-            timeout=120
+        process = await asyncio.create_subprocess_exec(
+            "adb", "-s", device_serial, "install", "-r", "-g", apk_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=120)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            log(f"[red]✗ Installation timeout on {device_serial}[/red]", console.print)
+            return False
         
-        if "Success" in result.stdout:
-            console.print(f"[green]✓ Successfully installed on {device_serial}[/green]")
+        if b"Success" in stdout:
+            log(f"[green]✓ Successfully installed on {device_serial}[/green]", console.print)
             return True
         else:
-            console.print(f"[red]✗ Failed to install on {device_serial}: {result.stderr}[/red]")
+            log(f"[red]✗ Failed to install on {device_serial}: {stderr.decode(errors='replace')}[/red]", console.print)
             return False
-    except subprocess.TimeoutExpired:
-        console.print(f"[red]✗ Installation timeout on {device_serial}[/red]")
-        return False
     except Exception as e:
-        console.print(f"[red]✗ Error installing on {device_serial}: {e}[/red]")
+        log(f"[red]✗ Error installing on {device_serial}: {e}[/red]", console.print)
         return False
 
+async def install_apks_on_devices(devices, apk_paths):
+    """Install APKs on every device at once; each device gets them one at a time"""
+    async def install_all(device):
+        return [await install_apk(device, apk_path) for apk_path in apk_paths]
+    
+    return await asyncio.gather(*(install_all(device) for device in devices))
+
+def get_device_packages(device_serial: str) -> set:
+    """Get the set of packages installed on a device"""
+    try:
+        result = subprocess.run(
+            ["adb", "-s", device_serial, "shell", "pm", "list", "packages"],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        # len("package:") == 8
+        return {line[8:] for line in result.stdout.splitlines() if line.startswith("package:")}
+    except:
+        return set()
+
 def check_installed_apps(device_serial: str):
     """Check which apps are installed on device"""
-    installed = {}
-    for app_name, app_info in PHONE_FARM_APPS.items():
-        try:
-            result = subprocess.run(
-                ["adb", "-s", device_serial, "shell", f"pm list packages | grep {app_info['package']}"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            installed[app_name] = app_info['package'] in result.stdout
-        except:
-            installed[app_name] = False
-    return installed
+    installed_pkgs = get_device_packages(device_serial)
+    return {
+        app_name: app_info['package'] in installed_pkgs
+        for app_name, app_info in PHONE_FARM_APPS.items()
+    }
 
 def main():
     """Main installation helper"""
@@ -108,22 +128,21 @@ def main():
     apk_dir = "apks"
     os.makedirs(apk_dir, exist_ok=True)
     
-    # Check installed apps on each device
-    for device in devices:
-        console.print(f"\n[bold]Device: {device}[/bold]")
-        installed = check_installed_apps(device)
-        
-        table = Table(title="App Status", show_header=True)
-        table.add_column("App", style="cyan")
-        table.add_column("Package", style="dim")
-        table.add_column("Status", style="white")
-        
-        for app_name, app_info in PHONE_FARM_APPS.items():
-            status = "✓ Installed" if installed[app_name] else "✗ Not Installed"
-            status_style = "green" if installed[app_name] else "red"
-            table.add_row(app_name, app_info['package'], f"[{status_style}]{status}[/{status_style}]")
-        
-        console.print(table)
+    # Check installed apps on all devices at once, then render a single table
+    table = Table(title="App Status", show_header=True)
+    table.add_column("Device", style="bold")
+    table.add_column("App", style="cyan")
+    table.add_column("Package", style="dim")
+    table.add_column("Status", style="white")
+    
+    for device, installed in zip(devices, run_on_all_devices(devices, check_installed_apps)):
+        for app_name, package in APP_ROWS:
+            status = "[green]✓ Installed[/green]" if installed[app_name] else "[red]✗ Not Installed[/red]"
+            table.add_row(device, app_name, package, status)
+        table.add_section()
+    
+    console.print()
+    console.print(table)
     
     # Installation instructions
     console.print("\n[bold yellow]Installation Options:[/bold yellow]")
@@ -142,7 +161,11 @@ def main():
     
     # Check for APKs in the directory
     console.print(f"\n[yellow]Checking for APKs in '{apk_dir}' folder...[/yellow]")
-    apk_files = [f for f in os.listdir(apk_dir) if f.endswith('.apk')] if os.path.exists(apk_dir) else []
+    try:
+        with os.scandir(apk_dir) as entries:
+            apk_files = [e.name for e in entries if e.name.endswith('.apk') and e.is_file()]
+    except FileNotFoundError:
+        apk_files = []
     
     if apk_files:
         console.print(f"[green]Found {len(apk_files)} APK(s):[/green]")
@@ -150,11 +173,9 @@ def main():
             console.print(f"  • {apk}")
         
         if Confirm.ask("\nInstall these APKs on all devices?"):
-            for device in devices:
-                console.print(f"\n[bold]Installing on {device}:[/bold]")
-                for apk in apk_files:
-                    apk_path = os.path.join(apk_dir, apk)
-                    install_apk(device, apk_path)
+            console.print(f"\n[bold]Installing on {len(devices)} device(s):[/bold]")
+            apk_paths = [os.path.join(apk_dir, apk) for apk in apk_files]
+            asyncio.run(install_apks_on_devices(devices, apk_paths))
     else:
         console.print(f"[yellow]No APKs found in '{apk_dir}' folder[/yellow]")
         console.print("\n[dim]Download APKs and place them in the 'apks' folder, then run this script again[/dim]")
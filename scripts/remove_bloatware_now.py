@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """Enhanced bloatware removal script with comprehensive detection and removal"""
 
+import argparse
+import re
+import shlex
 import subprocess
 import sys
 import time
@@ -10,86 +13,150 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config.bloatware import SAFE_TO_REMOVE, SAFE_TO_DISABLE, DO_NOT_REMOVE
-from core.utils import run_adb_command
+from core.utils import log, run_adb_command, run_on_all_devices
 
-def get_device_packages():
+# Names that look like games, matched against lowercased package names
+GAMING_RE = re.compile(r"game|solitaire|puzzle|candy|crush|monopoly|woodoku|mahjong|juggle|pixel\.art")
+
+# Seconds to pause a device after three back-to-back failures
+FAILURE_COOLDOWN = 0.5
+
+def get_connected_devices():
+    """Get serials of all authorized devices"""
+    result = run_adb_command(["devices"])
+    devices = []
+    for line in result.stdout.strip().split('\n')[1:]:
+        parts = line.split('\t')
+        if len(parts) == 2 and parts[1] == "device":
+            devices.append(parts[0])
+    return devices
+
+def get_device_packages(serial):
     """Get all installed packages on the device"""
     try:
-        result = run_adb_command(["shell", "pm", "list", "packages"])
+        result = run_adb_command(["shell", "pm", "list", "packages"], serial)
         if result.returncode == 0:
-            packages = []
-            for line in result.stdout.strip().split('\n'):
-                if line.startswith('package:'):
-                    packages.append(line.replace('package:', ''))
-            return packages
+            # len("package:") == 8
+            return [line[8:] for line in result.stdout.splitlines() if line.startswith("package:")]
         else:
-            print(f"Error getting packages: {result.stderr}")
+            log(f"[{serial}] Error getting packages: {result.stderr}")
             return []
     except Exception as e:
-        print(f"Error: {e}")
+        log(f"[{serial}] Error: {e}")
         return []
 
-def uninstall_package(package, user=0):
-    """Attempt to uninstall a package for a specific user"""
+# Device-side version of the uninstall -> disable -> hide fallback chain.
+# Prints "::<package>::<status>" so one adb call can cover a whole batch.
+REMOVE_FN = (
+    'r() { '
+    'out=$(pm uninstall --user "$2" "$1" 2>&1) && { echo "::$1::uninstalled"; return; }; '
+    'case "$out" in *"not installed for"*) echo "::$1::not_present"; return;; esac; '
+    'pm disable-user --user "$2" "$1" >/dev/null 2>&1 && { echo "::$1::disabled"; return; }; '
+    'pm hide "$1" >/dev/null 2>&1 && { echo "::$1::hidden"; return; }; '
+    'echo "::$1::failed"; '
+    '}'
+)
+
+# Packages handled per adb round-trip
+BATCH_SIZE = 20
+
+def uninstall_batch(serial, packages, user=0):
+    """Uninstall (or disable/hide) a batch of packages in one adb call, returning {package: (success, status)}"""
+    script = "; ".join([REMOVE_FN] + [f"r {shlex.quote(package)} {int(user)}" for package in packages])
     try:
-        # Try uninstall for user
-        result = run_adb_command(["shell", "pm", "uninstall", "--user", str(user), package])
-        if result.returncode == 0:
-            return True, "uninstalled"
-        
-        # If uninstall fails, try to disable
-        result = run_adb_command(["shell", "pm", "disable-user", "--user", str(user), package])
-        if result.returncode == 0:
-            return True, "disabled"
+        result = run_adb_command(["shell", script], serial, timeout=30 + 5 * len(packages))
+    except Exception as e:
+        return {package: (False, str(e)) for package in packages}
+    
+    outcomes = {}
+    for line in result.stdout.splitlines():
+        if line.startswith("::"):
+            package, _, status = line[2:].partition("::")
+            outcomes[package] = (status != "failed", status)
+    
+    # Anything without a marker never ran (e.g. the shell died mid-batch)
+    return {package: outcomes.get(package, (False, "no response")) for package in packages}
+
+def classify_packages(installed_packages):
+    """Split installed packages into (to_remove, to_disable) lists"""
+    bloatware_to_remove = []
+    bloatware_to_disable = []
+    
+    for package in installed_packages:
+        if package in DO_NOT_REMOVE:
+            continue
+        elif package in SAFE_TO_REMOVE:
+            bloatware_to_remove.append(package)
+        elif package in SAFE_TO_DISABLE:
+            bloatware_to_disable.append(package)
+    
+    return bloatware_to_remove, bloatware_to_disable
+
+def process_device(serial, bloatware_to_remove, bloatware_to_disable):
+    """Remove then disable bloatware on one device, a batch at a time"""
+    results = []
+    consecutive_failures = 0
+    
+    work = [(package, "remove") for package in bloatware_to_remove] + \
+           [(package, "disable") for package in bloatware_to_disable]
+    
+    for start in range(0, len(work), BATCH_SIZE):
+        batch = work[start:start + BATCH_SIZE]
+        outcomes = uninstall_batch(serial, [package for package, _ in batch])
         
-        # Last resort - hide the package
-        result = run_adb_command(["shell", "pm", "hide", package])
-        if result.returncode == 0:
-            return True, "hidden"
+        for package, action in batch:
+            success, status = outcomes[package]
+            if success:
+                log(f"  [{serial}] ✅ Successfully {status}: {package}")
+                consecutive_failures = 0
+            else:
+                log(f"  [{serial}] ❌ Failed to {action}: {package} ({status})")
+                consecutive_failures += 1
+            results.append((package, status, success))
         
-        return False, "failed"
-    except Exception as e:
-        return False, str(e)
+        # Give a struggling device a moment instead of throttling every batch
+        if consecutive_failures > 2:
+            time.sleep(FAILURE_COOLDOWN)
+            consecutive_failures = 0
+    
+    return results
 
-def main():
+def main(verify=False):
     print("=" * 60)
     print("ENHANCED BLOATWARE REMOVAL SCRIPT")
     print("=" * 60)
     
-    # Check if device is connected
-    result = run_adb_command(["devices"])
-    if "device" not in result.stdout:
+    # Check if any device is connected
+    devices = get_connected_devices()
+    if not devices:
         print("❌ No device connected. Please connect a device first.")
         sys.exit(1)
     
-    print("✅ Device connected. Getting installed packages...")
+    print(f"✅ {len(devices)} device(s) connected. Getting installed packages...")
     
-    # Get all installed packages
-    installed_packages = get_device_packages()
-    if not installed_packages:
+    # Get all installed packages on every device at once
+    installed_by_device = dict(zip(devices, run_on_all_devices(devices, get_device_packages)))
+    devices = [serial for serial in devices if installed_by_device[serial]]
+    if not devices:
         print("❌ Could not get installed packages")
         sys.exit(1)
     
-    print(f"Found {len(installed_packages)} installed packages")
+    # Identify bloatware per device
+    plans = {}
+    for serial in devices:
+        installed_packages = installed_by_device[serial]
+        plans[serial] = classify_packages(installed_packages)
+        print(f"[{serial}] Found {len(installed_packages)} installed packages")
     
-    # Identify bloatware
-    bloatware_to_remove = []
-    bloatware_to_disable = []
-    
-    for package in installed_packages:
-        if package in DO_NOT_REMOVE:
-            continue
-        elif package in SAFE_TO_REMOVE:
-            bloatware_to_remove.append(package)
-        elif package in SAFE_TO_DISABLE:
-            bloatware_to_disable.append(package)
+    bloatware_to_remove = sorted({pkg for remove, _ in plans.values() for pkg in remove})
+    bloatware_to_disable = sorted({pkg for _, disable in plans.values() for pkg in disable})
     
     print(f"\nIdentified bloatware:")
     print(f"  • {len(bloatware_to_remove)} packages to remove")
     print(f"  • {len(bloatware_to_disable)} packages to disable")
     
     if not bloatware_to_remove and not bloatware_to_disable:
-        print("\n✅ No bloatware found on this device!")
+        print("\n✅ No bloatware found on any device!")
         return
     
     # Show what will be removed
@@ -114,56 +181,31 @@ def main():
         print("❌ Aborted by user")
         return
     
-    # Remove bloatware
+    # Remove bloatware on all devices in parallel; each device works through its list in order
     print("\n" + "=" * 60)
     print("REMOVING BLOATWARE...")
     print("=" * 60)
     
-    success_count = 0
-    failed_count = 0
-    results = []
-    
-    # Process removals
-    for package in bloatware_to_remove:
-        print(f"\nRemoving: {package}")
-        success, status = uninstall_package(package)
-        if success:
-            print(f"  ✅ Successfully {status}: {package}")
-            success_count += 1
-            results.append((package, status, True))
-        else:
-            print(f"  ❌ Failed to remove: {package} ({status})")
-            failed_count += 1
-            results.append((package, status, False))
-        time.sleep(0.1)  # Small delay between operations
-    
-    # Process disables
-    for package in bloatware_to_disable:
-        print(f"\nDisabling: {package}")
-        success, status = uninstall_package(package)
-        if success:
-            print(f"  ✅ Successfully {status}: {package}")
-            success_count += 1
-            results.append((package, status, True))
-        else:
-            print(f"  ❌ Failed to disable: {package} ({status})")
-            failed_count += 1
-            results.append((package, status, False))
-        time.sleep(0.1)
+    device_results = run_on_all_devices(devices, lambda serial: process_device(serial, *plans[serial]))
     
     # Summary
     print("\n" + "=" * 60)
     print("SUMMARY")
     print("=" * 60)
+    
+    failed = [(serial, pkg, status)
+              for serial, results in zip(devices, device_results)
+              for pkg, status, success in results if not success]
+    success_count = sum(len(results) for results in device_results) - len(failed)
+    
     print(f"✅ Successfully processed: {success_count} packages")
-    print(f"❌ Failed: {failed_count} packages")
+    print(f"❌ Failed: {len(failed)} packages")
     
     # Show detailed results
-    if failed_count > 0:
+    if failed:
         print("\nFailed packages:")
-        for pkg, status, success in results:
-            if not success:
-                print(f"  • {pkg}: {status}")
+        for serial, pkg, status in failed:
+            print(f"  • [{serial}] {pkg}: {status}")
     
     print("\n✅ Bloatware removal completed!")
     
@@ -173,27 +215,33 @@ def main():
     print("=" * 60)
     print("Checking for remaining gaming/bloatware apps...")
     
-    remaining_packages = get_device_packages()
-    gaming_patterns = ["game", "solitaire", "puzzle", "candy", "crush", "monopoly", "woodoku", "mahjong", "juggle", "pixel.art"]
-    
-    remaining_games = []
-    for package in remaining_packages:
-        package_lower = package.lower()
-        for pattern in gaming_patterns:
-            if pattern in package_lower and package not in DO_NOT_REMOVE:
-                remaining_games.append(package)
-                break
-    
-    if remaining_games:
-        print(f"\n⚠️  Found {len(remaining_games)} gaming apps still installed:")
-        for game in remaining_games:
-            print(f"  • {game}")
-        print("\nThese may require manual removal or different methods.")
+    # We already know what was removed; only re-query the devices when asked to
+    if verify:
+        remaining_by_device = run_on_all_devices(devices, get_device_packages)
     else:
-        print("✅ No gaming apps detected!")
+        remaining_by_device = []
+        for serial, results in zip(devices, device_results):
+            removed = {pkg for pkg, _, success in results if success}
+            remaining_by_device.append([pkg for pkg in installed_by_device[serial] if pkg not in removed])
+    
+    for serial, remaining_packages in zip(devices, remaining_by_device):
+        remaining_games = [p for p in remaining_packages
+                           if GAMING_RE.search(p.lower()) and p not in DO_NOT_REMOVE]
+        
+        if remaining_games:
+            print(f"\n⚠️  [{serial}] Found {len(remaining_games)} gaming apps still installed:")
+            for game in remaining_games:
+                print(f"  • {game}")
+            print("\nThese may require manual removal or different methods.")
+        else:
+            print(f"✅ [{serial}] No gaming apps detected!")
     
     print("\n" + "=" * 60)
     print("Script completed!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Remove known bloatware from every connected device")
+    parser.add_argument("--verify", action="store_true",
+                        help="re-list packages from the devices for the final verification")
+    args = parser.parse_args()
+    main(verify=args.verify)
\ No newline at end of file
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 """Standalone bloatware removal script - no dependencies"""
 
+import argparse
+import asyncio
+import re
 import subprocess
 import sys
-import time
+
+# pm uninstalls kept in flight at once; the device still applies them one by one
+MAX_CONCURRENT_UNINSTALLS = 4
 
 # Comprehensive bloatware list
-SAFE_TO_REMOVE = [
+SAFE_TO_REMOVE = frozenset({
     # Facebook
     "com.facebook.katana",
     "com.facebook.system",
@@ -67,57 +72,101 @@ SAFE_TO_REMOVE = [
     "com.samsung.android.game.gamehome",
     "com.samsung.android.game.gametools",
     "com.samsung.android.game.gos",
-]
+})
+
+# Names that look like games, matched against lowercased package names
+GAMING_RE = re.compile(r"game|solitaire|puzzle|candy|crush|monopoly|woodoku|mahjong|juggle|pixel\.art|tetris|casino|slots|poker")
+# System packages never reported as games
+SYSTEM_RE = re.compile(r"com\.android\.systemui|com\.android\.settings|com\.google\.android\.gms")
 
-def run_command(cmd):
-    """Run a shell command and return the result"""
+def run_command(argv):
+    """Run a command (argv list, no shell) and return the result"""
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=30)
+        result = subprocess.run(argv, capture_output=True, text=True, timeout=30)
         return result.returncode == 0, result.stdout, result.stderr
     except subprocess.TimeoutExpired:
         return False, "", "Command timed out"
     except Exception as e:
         return False, "", str(e)
 
+async def run_command_async(argv, timeout=30, capture=True):
+    """Run a command (argv list, no shell) without blocking the event loop"""
+    # Callers that only need the exit code skip buffering the output
+    stream = asyncio.subprocess.PIPE if capture else asyncio.subprocess.DEVNULL
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=stream,
+            stderr=stream
+        )
+    except Exception as e:
+        return False, "", str(e)
+    
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return False, "", "Command timed out"
+    return (process.returncode == 0,
+            (stdout or b"").decode(errors="replace"),
+            (stderr or b"").decode(errors="replace"))
+
 def get_device_packages():
     """Get all installed packages on the device"""
-    success, stdout, stderr = run_command("adb shell pm list packages")
+    success, stdout, stderr = run_command(["adb", "shell", "pm", "list", "packages"])
     if success:
-        packages = []
-        for line in stdout.strip().split('\n'):
-            if line.startswith('package:'):
-                packages.append(line.replace('package:', ''))
-        return packages
+        # len("package:") == 8
+        return [line[8:] for line in stdout.splitlines() if line.startswith("package:")]
     else:
         print(f"Error getting packages: {stderr}")
         return []
 
-def uninstall_package(package):
+async def uninstall_package(package):
     """Attempt to uninstall a package"""
     # Try uninstall for user 0
-    success, stdout, stderr = run_command(f"adb shell pm uninstall --user 0 {package}")
+    success, stdout, stderr = await run_command_async(["adb", "shell", "pm", "uninstall", "--user", "0", package])
     if success:
         return True, "uninstalled"
     
+    # Already gone for this user; disabling would just fail too
+    if "not installed for" in stdout + stderr:
+        return True, "not_present"
+    
     # Try to disable
-    success, stdout, stderr = run_command(f"adb shell pm disable-user --user 0 {package}")
+    success, stdout, stderr = await run_command_async(["adb", "shell", "pm", "disable-user", "--user", "0", package], capture=False)
     if success:
         return True, "disabled"
     
     # Try to hide
-    success, stdout, stderr = run_command(f"adb shell pm hide {package}")
+    success, stdout, stderr = await run_command_async(["adb", "shell", "pm", "hide", package], capture=False)
     if success:
         return True, "hidden"
     
     return False, "failed"
 
-def main():
+async def remove_packages(packages, concurrency=MAX_CONCURRENT_UNINSTALLS):
+    """Uninstall packages with a few requests in flight, reporting each as it finishes"""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def remove(package):
+        async with semaphore:
+            success, status = await uninstall_package(package)
+        if success:
+            print(f"  ✅ Successfully {status}: {package}")
+        else:
+            print(f"  ❌ Failed to remove: {package}")
+        return success
+    
+    return await asyncio.gather(*(remove(package) for package in packages))
+
+def main(verify=False):
     print("=" * 60)
     print("STANDALONE BLOATWARE REMOVAL SCRIPT")
     print("=" * 60)
     
     # Check if device is connected
-    success, stdout, stderr = run_command("adb devices")
+    success, stdout, stderr = run_command(["adb", "devices"])
     if not success or "device" not in stdout:
         print("❌ No device connected. Please connect a device first.")
         sys.exit(1)
@@ -158,19 +207,9 @@ def main():
     print("REMOVING BLOATWARE...")
     print("=" * 60)
     
-    success_count = 0
-    failed_count = 0
-    
-    for package in bloatware_found:
-        print(f"\nProcessing: {package}")
-        success, status = uninstall_package(package)
-        if success:
-            print(f"  ✅ Successfully {status}: {package}")
-            success_count += 1
-        else:
-            print(f"  ❌ Failed to remove: {package}")
-            failed_count += 1
-        time.sleep(0.2)
+    results = asyncio.run(remove_packages(bloatware_found))
+    success_count = sum(results)
+    failed_count = len(results) - success_count
     
     # Summary
     print("\n" + "=" * 60)
@@ -185,20 +224,14 @@ def main():
     print("=" * 60)
     print("Checking for remaining gaming apps...")
     
-    remaining_packages = get_device_packages()
-    gaming_keywords = ["game", "solitaire", "puzzle", "candy", "crush", 
-                      "monopoly", "woodoku", "mahjong", "juggle", "pixel.art",
-                      "tetris", "casino", "slots", "poker"]
-    
-    remaining_games = []
-    for package in remaining_packages:
-        package_lower = package.lower()
-        for keyword in gaming_keywords:
-            if keyword in package_lower:
-                # Skip system packages
-                if not any(sys_pkg in package for sys_pkg in ["com.android.systemui", "com.android.settings", "com.google.android.gms"]):
-                    remaining_games.append(package)
-                    break
+    # We already know what was removed; only re-query the device when asked to
+    if verify:
+        remaining_packages = get_device_packages()
+    else:
+        removed = {pkg for pkg, success in zip(bloatware_found, results) if success}
+        remaining_packages = [pkg for pkg in installed_packages if pkg not in removed]
+    remaining_games = [p for p in remaining_packages
+                       if GAMING_RE.search(p.lower()) and not SYSTEM_RE.search(p)]
     
     if remaining_games:
         print(f"\n⚠️  Found {len(remaining_games)} potential gaming apps still installed:")
@@ -211,4 +244,8 @@ def main():
     print("✅ Script completed!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Remove known bloatware from the connected device")
+    parser.add_argument("--verify", action="store_true",
+                        help="re-list packages from the device for the final verification")
+    args = parser.parse_args()
+    main(verify=args.verify)
\ No newline at end of file
@@ -1,12 +1,36 @@
 #!/usr/bin/env python3
 """SAFE bloatware removal - Only removes known safe-to-remove apps"""
 
+import argparse
+import asyncio
+import shlex
 import subprocess
 import sys
-import time
+import threading
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.persistent_shell import PersistentShell
+from core.utils import MAX_DEVICE_WORKERS, adb_argv, run_adb_command
+
+# Packages per adb shell call (how many calls run at once is --max-concurrency)
+BATCH_SIZE = 16
+
+# Seconds to wait for quick adb calls, for the device to come up, for the package
+# listing, and for a whole uninstall batch (its packages are skipped past that)
+COMMAND_TIMEOUT = 5
+WAIT_FOR_DEVICE_TIMEOUT = 10
+LIST_PACKAGES_TIMEOUT = 15
+BATCH_TIMEOUT = 30
+
+# Delay added between batches while the package manager is timing out (doubles up to the cap)
+BACKOFF_START = 0.05
+MAX_BACKOFF = 0.5
 
 # ONLY remove these specific apps that are 100% safe to remove
-SAFE_BLOATWARE = [
+SAFE_BLOATWARE = frozenset({
     # Games - Safe to remove
     "com.king.candycrushsaga",
     "com.rovio.angrybirds",
@@ -84,38 +108,138 @@ SAFE_BLOATWARE = [
     "com.google.android.apps.books",
     "com.google.android.apps.tachyon",  # Google Duo
     "com.google.android.apps.podcasts",
-]
+})
+
+# Whole vendor families - every package under these prefixes, including unreviewed ones.
+# Only used with --families; by default only the list above is removed.
+SAFE_FAMILIES = frozenset({
+    "com.facebook",  # Facebook app, installer and services
+    "com.microsoft.office",  # Excel, Word, PowerPoint, Outlook, ...
+    "com.samsung.android.bixby",  # Bixby (optional)
+})
+
+def build_package_trie(prefixes):
+    """Nest package names by dotted segment; a None key marks the end of a listed name"""
+    trie = {}
+    for prefix in prefixes:
+        node = trie
+        for segment in prefix.split("."):
+            node = node.setdefault(segment, {})
+        node[None] = True
+    return trie
 
-def run_command(cmd):
-    """Run a shell command and return the result"""
+SAFE_FAMILY_TRIE = build_package_trie(SAFE_FAMILIES)
+
+# Vendor builds known to ship a listed app under an extra suffix (e.g. com.samsung.android.tvplus.overlay).
+# Only these exact suffixes count; other child packages of a listed app are not matched.
+SAFE_VARIANT_SUFFIXES = ("overlay",)
+SAFE_VARIANTS = frozenset(f"{name}.{suffix}" for name in SAFE_BLOATWARE for suffix in SAFE_VARIANT_SUFFIXES)
+
+def is_safe_bloatware(package, families=False):
+    """Check a package against the known apps and their known variants (and the vendor families if asked)"""
+    # Listed apps and variants are exact lookups; only misses walk the family trie
+    if package in SAFE_BLOATWARE or package in SAFE_VARIANTS:
+        return True
+    if not families:
+        return False
+    node = SAFE_FAMILY_TRIE
+    for segment in package.split("."):
+        node = node.get(segment)
+        if node is None:
+            return False
+        if None in node:
+            return True
+    return False
+
+def run_command(args, serial=None, timeout=COMMAND_TIMEOUT):
+    """Run an adb command (argv list, no shell) and return the result"""
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=30)
+        result = run_adb_command(args, serial, timeout=timeout)
         return result.returncode == 0, result.stdout, result.stderr
     except Exception as e:
         return False, "", str(e)
 
-def get_device_packages():
-    """Get all installed packages on the device"""
-    success, stdout, stderr = run_command("adb shell pm list packages")
-    if success:
-        packages = []
-        for line in stdout.strip().split('\n'):
-            if line.startswith('package:'):
-                packages.append(line.replace('package:', '').strip())
-        return packages
-    return []
-
-def uninstall_package(package):
-    """Safely uninstall a package (user-level only)"""
-    # Only uninstall for user 0 - can be restored with factory reset
-    success, stdout, stderr = run_command(f"adb shell pm uninstall --user 0 {package}")
-    if success or "Success" in stdout:
-        return True, "uninstalled"
+def get_device_serial(devices_output):
+    """Get the serial of the first ready device from `adb devices` output"""
+    for line in devices_output.splitlines()[1:]:
+        serial, _, state = line.partition("\t")
+        if state.strip() == "device":
+            return serial
+    return None
+
+def iter_device_packages(lines):
+    """Yield package names from `pm list packages` output lines"""
+    for line in lines:
+        if line.startswith('package:'):
+            # len("package:") == 8
+            yield line[8:].rstrip()
+
+async def uninstall_batch(shell, packages):
+    """Safely uninstall a batch of packages (user-level only) in one round-trip of a persistent shell"""
+    # Only uninstall for user 0 - can be restored with factory reset.
+    # Each package reports "::<package>::ok|fail" so results can be matched back up.
+    script = " ; ".join(
+        f'pm uninstall --user 0 {q} >/dev/null 2>&1 && echo "::"{q}"::ok" || echo "::"{q}"::fail"'
+        for q in map(shlex.quote, packages)
+    )
+    
+    try:
+        _, output = await shell.run(script, timeout=BATCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        # The shell is restarted on its next use; this batch's outcome is unknown
+        return [(package, (False, "skipped (timeout)")) for package in packages]
+    except Exception as e:
+        # A transport problem, not a protected package
+        return [(package, (False, f"error ({e or type(e).__name__})")) for package in packages]
+    
+    outcomes = {}
+    for line in output.splitlines():
+        if line.startswith("::"):
+            package, _, status = line.rstrip()[2:].partition("::")
+            outcomes[package] = status == "ok"
     
     # If uninstall fails, DON'T try to disable system apps
-    return False, "skipped (protected)"
+    return [(package, (True, "uninstalled") if outcomes.get(package)
+             else (False, "skipped (protected)" if package in outcomes else "error (no result)"))
+            for package in packages]
+
+async def remove_packages(serial, packages, pace=0.0, max_concurrency=MAX_DEVICE_WORKERS):
+    """Uninstall packages in batches, several batches at a time, reporting each as it finishes"""
+    batches = [packages[i:i + BATCH_SIZE] for i in range(0, len(packages), BATCH_SIZE)]
+    # One persistent shell per concurrent batch; a batch borrows a free one
+    shells = asyncio.Queue()
+    for _ in range(min(max_concurrency, len(batches))):
+        shells.put_nowait(PersistentShell(serial))
+    # Only wait between batches when asked to, or while the device is congested
+    backoff = pace
+    
+    async def remove(batch):
+        nonlocal backoff
+        shell = await shells.get()
+        try:
+            if backoff:
+                await asyncio.sleep(backoff)
+            results = await uninstall_batch(shell, batch)
+        finally:
+            shells.put_nowait(shell)
+        # Protected packages are expected failures; only timeouts mean congestion
+        if any(status == "skipped (timeout)" for _, (_, status) in results):
+            backoff = min(MAX_BACKOFF, max(backoff * 2, BACKOFF_START))
+        else:
+            backoff = pace
+        for package, (success, status) in results:
+            icon = "✅" if success else "❌" if status.startswith("error") else "⚠️ "
+            print(f"  {icon} {package}: {status}")
+        return results
+    
+    try:
+        return [result for results in await asyncio.gather(*(remove(batch) for batch in batches))
+                for result in results]
+    finally:
+        while not shells.empty():
+            await shells.get_nowait().close()
 
-def main():
+def main(pace=0.0, families=False, max_concurrency=MAX_DEVICE_WORKERS):
     print("=" * 70)
     print("SAFE BLOATWARE REMOVAL")
     print("=" * 70)
@@ -123,26 +247,54 @@ def main():
     print("It will NOT touch any system-critical components.")
     
     # Check device connection
-    success, stdout, stderr = run_command("adb devices")
-    if not success or "device" not in stdout:
+    success, stdout, stderr = run_command(["devices"])
+    serial = get_device_serial(stdout) if success else None
+    if not serial:
         print("\n❌ No device connected.")
         sys.exit(1)
     
+    # Make sure the transport is actually up before the package burst
+    success, _, _ = run_command(["wait-for-device"], serial, timeout=WAIT_FOR_DEVICE_TIMEOUT)
+    if not success:
+        print("\n❌ Device did not become ready.")
+        sys.exit(1)
+    
     print("\n✅ Device connected. Analyzing packages...")
     
-    # Get installed packages
-    packages = get_device_packages()
-    if not packages:
+    # Stream installed packages, keeping only the bloatware as they are parsed.
+    # Variants can show up anywhere in the list, so it is always read to the end.
+    total = 0
+    found = set()
+    try:
+        process = subprocess.Popen(adb_argv(["shell", "pm", "list", "packages"], serial),
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, close_fds=False)
+    except Exception:
+        process = None
+    
+    if process:
+        # Reading stdout blocks, so a watchdog kills a listing that stalls midway
+        watchdog = threading.Timer(LIST_PACKAGES_TIMEOUT, process.kill)
+        watchdog.start()
+        try:
+            with process:
+                for package in iter_device_packages(process.stdout):
+                    total += 1
+                    if is_safe_bloatware(package, families):
+                        found.add(package)
+        finally:
+            watchdog.cancel()
+        # A cut-off listing would silently miss bloatware
+        if process.returncode != 0:
+            total = 0
+    
+    if not total:
         print("❌ Could not get packages")
         sys.exit(1)
     
-    print(f"📦 Found {len(packages)} total packages")
+    print(f"📦 Found {total} total packages")
     
     # Find bloatware to remove
-    to_remove = []
-    for package in packages:
-        if package in SAFE_BLOATWARE:
-            to_remove.append(package)
+    to_remove = sorted(found)
     
     if not to_remove:
         print("\n✅ No known bloatware found! Device is clean.")
@@ -164,19 +316,10 @@ def main():
     print("REMOVING SAFE BLOATWARE...")
     print("=" * 70)
     
-    success_count = 0
-    failed_count = 0
-    
-    for package in to_remove:
-        print(f"\nRemoving: {package}")
-        success, status = uninstall_package(package)
-        if success:
-            print(f"  ✅ {status}")
-            success_count += 1
-        else:
-            print(f"  ⚠️  {status}")
-            failed_count += 1
-        time.sleep(0.1)
+    results = asyncio.run(remove_packages(serial, to_remove, pace, max_concurrency))
+    success_count = sum(1 for _, (success, _) in results if success)
+    error_count = sum(1 for _, (_, status) in results if status.startswith("error"))
+    failed_count = len(results) - success_count - error_count
     
     # Summary
     print("\n" + "=" * 70)
@@ -184,14 +327,27 @@ def main():
     print("=" * 70)
     print(f"✅ Successfully removed: {success_count} apps")
     if failed_count > 0:
-        print(f"⚠️  Skipped (protected): {failed_count} apps")
+        print(f"⚠️  Skipped (protected or timed out): {failed_count} apps")
+    if error_count > 0:
+        print(f"❌ Errors (device connection): {error_count} apps")
     
     print("\n✅ Safe cleanup complete!")
     print("Your device remains stable and functional.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove known safe-to-remove apps from the connected device")
+    parser.add_argument("--pace", type=float, default=0.0, metavar="SECONDS",
+                        help="Wait this long before every uninstall batch (for slow devices)")
+    parser.add_argument("--families", action="store_true",
+                        help="Also remove every package under the vendor families "
+                             f"({', '.join(sorted(SAFE_FAMILIES))}), not just the listed apps")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_DEVICE_WORKERS, metavar="N",
+                        help=f"Uninstall batches (adb shells) run at once (default: {MAX_DEVICE_WORKERS})")
+    args = parser.parse_args()
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
     try:
-        main()
+        main(pace=args.pace, families=args.families, max_concurrency=args.max_concurrency)
     except KeyboardInterrupt:
         print("\n\n❌ Cancelled by user")
         sys.exit(1)
\ No newline at end of file
@@ -48,12 +48,37 @@ async def test_parallel_connections():
     
     start_time = time.time()
     
-    # Progress callback to show live updates
+    # The callback only records the latest counts; one task redraws the line
+    # every 100 ms so terminal writes stay off the connection path
+    progress = None
+    
     async def progress_callback(connected_count, total_count):
-        print(f"   Progress: {connected_count}/{total_count} devices connected")
+        nonlocal progress
+        progress = (connected_count, total_count)
+    
+    def render_progress():
+        if progress:
+            sys.stdout.write(f"\r   Progress: {progress[0]}/{progress[1]} devices connected")
+            sys.stdout.flush()
+    
+    async def render_loop():
+        shown = None
+        while True:
+            await asyncio.sleep(0.1)
+            if progress != shown:
+                shown = progress
+                render_progress()
     
     # Connect with progress updates
-    connected_count = await device_manager.connect_all_devices(progress_callback)
+    render_task = asyncio.create_task(render_loop())
+    try:
+        connected_count = await device_manager.connect_all_devices(progress_callback)
+    finally:
+        render_task.cancel()
+        # Always show the final counts
+        render_progress()
+        if progress:
+            print()
     
     elapsed_time = time.time() - start_time
     
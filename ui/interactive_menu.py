@@ -1,9 +1,14 @@
 """Interactive menu with arrow key navigation and forest green theme"""
 
+import codecs
 import os
+import select
+import shutil
 import sys
 import termios
 import tty
+from collections import OrderedDict, deque
+from functools import lru_cache
 from typing import List, Optional, Callable
 from rich.console import Console
 from rich.panel import Panel
@@ -14,6 +19,14 @@ from rich.table import Table
 from rich import box
 
 
+# Erase the screen and home the cursor
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+# DEC mode 2026 (synchronized output): terminals that support it show everything
+# between these at once; others ignore them
+SYNC_START = "\x1b[?2026h"
+SYNC_END = "\x1b[?2026l"
+
+
 # Refined theme with less overwhelming green
 THEME = {
     'primary': 'green',           # Primary accent
@@ -28,77 +41,252 @@ THEME = {
 }
 
 
+# Keys reported from escape sequences; everything else starting with ESC is ignored
+ARROW_KEYS = frozenset({'\x1b[A', '\x1b[B', '\x1b[C', '\x1b[D'})
+# Number shortcut keys -> menu index
+DIGIT_KEYS = {str(number): number - 1 for number in range(1, 10)}
+# How long to wait for the rest of an escape sequence split across reads (slow SSH links)
+ESC_SEQUENCE_TIMEOUT = 0.05
+
+
+def split_keys(data: str):
+    """Split raw terminal input into keys, returning (keys, trailing incomplete escape sequence)"""
+    keys = []
+    i, n = 0, len(data)
+    while i < n:
+        if data[i] != '\x1b':
+            keys.append(data[i])
+            i += 1
+            continue
+        if i + 1 == n:
+            # ESC on its own so far; the rest may still be on its way
+            return keys, data[i:]
+        if data[i + 1] not in '[O':
+            # Alt+key - ignored, like a standalone ESC
+            i += 2
+            continue
+        # CSI / SS3: parameter bytes up to a final byte in '@'..'~'
+        end = i + 2
+        while end < n and not '@' <= data[end] <= '~':
+            end += 1
+        if end == n:
+            return keys, data[i:]
+        # Arrows may come as ESC O A in application cursor mode
+        key = '\x1b[' + data[end] if end == i + 2 else data[i:end + 1]
+        if key in ARROW_KEYS:
+            keys.append(key)
+        i = end + 1
+    return keys, ''
+
+
+# Static menu pieces, built once
+MENU_SEPARATOR = Text("\n     ─────────────────────────────", style=THEME['dim'])
+MENU_CONTROLS = Text("\n\n  ↑↓ Navigate   Enter Select   Q Exit", style=THEME['dim'])
+# Main menu items followed by a separator
+SEPARATOR_ROWS = frozenset({0, 1, 4})
+# Actions shown dimmed
+DIM_ACTIONS = frozenset({'exit', 'back'})
+
+
+# Device table cells: status -> (icon, style) and proxy status -> (label, style)
+STATUS_STYLES = {
+    "connected": ("▸", THEME['success']),      # Filled chevron for connected
+    "device": ("›", THEME['warning']),          # Single chevron for authorized
+    "unauthorized": ("‹", THEME['error']),      # Left chevron for unauthorized
+    "disconnected": ("·", THEME['dim']),        # Small dot for disconnected
+}
+UNKNOWN_STATUS_STYLE = ("?", THEME['text'])
+PROXY_STYLES = {
+    "Running": ("▶ Running", THEME['success']),
+    "App Open": ("◐ App Open", THEME['warning']),
+    "Set (No App)": ("⚠ Set (No App)", THEME['warning']),
+    "Stopped": ("◼ Stopped", THEME['dim']),
+}
+
+
+# Device table columns: (header, add_column options)
+DEVICE_TABLE_COLUMNS = (
+    ("#", {'style': THEME['dim'], 'width': 3}),
+    ("Serial", {'style': THEME['text']}),
+    ("Model", {'style': THEME['text']}),
+    ("Interface", {'style': THEME['text'], 'justify': "left"}),
+    ("IP Address", {'style': THEME['text']}),
+    ("Proxy", {'justify': "center"}),
+    ("Status", {'justify': "center"}),
+)
+
+
+@lru_cache(maxsize=16)
+def build_status_text(devices_count: int, connected_count: int) -> Text:
+    """Build the device status line (cached; the counts rarely change between frames)"""
+    status_text = Text()
+    status_text.append("Devices: ", style=THEME['dim'])
+    status_text.append(f"{devices_count}", style=THEME['secondary'])
+    status_text.append("  │  ", style=THEME['dim'])
+    status_text.append("Connected: ", style=THEME['dim'])
+    color = THEME['success'] if connected_count > 0 else THEME['dim']
+    status_text.append(f"{connected_count}", style=color)
+    
+    status_text.justify = "center"
+    return status_text
+
+
+@lru_cache(maxsize=64)
+def build_menu_item_text(label: str, selected: bool, dim: bool) -> Text:
+    """Build one menu line (cached; each item only ever has two looks)"""
+    item_text = Text()
+    
+    # Simple selection with arrow
+    if selected:
+        item_text.append("  ▶  ", style=THEME['primary'])
+        item_text.append(label, style=f"bold {THEME['highlight']}")
+    else:
+        item_text.append("     ", style="")
+        item_text.append(label, style=THEME['dim'] if dim else THEME['text'])
+    
+    return item_text
+
+
+class _RawMode:
+    """Hold a terminal in raw input mode for a whole block instead of per keystroke"""
+    
+    def __init__(self, fd: int):
+        self.fd = fd
+        self._saved = None
+    
+    def __enter__(self):
+        self._saved = termios.tcgetattr(self.fd)
+        tty.setraw(self.fd)
+        # Keep output processing on, so frames drawn meanwhile still get \n -> \r\n
+        mode = termios.tcgetattr(self.fd)
+        mode[1] |= termios.OPOST
+        termios.tcsetattr(self.fd, termios.TCSANOW, mode)
+        return self
+    
+    def __exit__(self, *exc_info):
+        termios.tcsetattr(self.fd, termios.TCSADRAIN, self._saved)
+
+
 class InteractiveMenu:
+    # Where navigate_menu's frame puts the menu items: the first item's screen row
+    # (header panel, blank, status, two blanks, then the menu panel's border and top padding),
+    # the column item text starts at, and the text width inside the 45-wide panel
+    MENU_FIRST_ROW = 10
+    MENU_CONTENT_COL = 4
+    MENU_CONTENT_WIDTH = 39
+    # Rendered navigate_menu frames kept for reuse
+    FRAME_CACHE_SIZE = 64
+    
     def __init__(self, console: Optional[Console] = None):
         self.console = console or Console()
         self.selected_index = 0
+        # Row of each item within the menu, counted from the first item (set by display_menu)
+        self._item_rows: List[int] = []
+        # The header never changes, so it is built on first use and reused
+        self._header_panel: Optional[Panel] = None
+        # Frame state -> (rendered frame, item rows), most recently used last
+        self._frame_cache = OrderedDict()
+        # (device table contents, Table) from the last display_device_table
+        self._device_table_cache = None
+        # Set while navigate_menu holds the terminal in raw mode
+        self._raw_mode: Optional[_RawMode] = None
+        # Keys already read but not yet returned, and the start of a split escape sequence
+        self._pending_keys = deque()
+        self._partial_key = ''
+        self._key_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        # Bound once; these run on every keypress
+        self._write = sys.stdout.write
+        self._flush = sys.stdout.flush
         
     def clear_screen(self):
         """Clear the terminal screen"""
-        os.system('clear' if os.name == 'posix' else 'cls')
+        if os.name == 'posix':
+            # Erase the screen and home the cursor directly, no clear(1) process
+            self._write(CLEAR_SCREEN)
+            self._flush()
+        else:
+            os.system('cls')
+    
+    def show_frame(self, frame: str):
+        """Replace the screen with a pre-rendered frame in a single write"""
+        if os.name == 'posix':
+            # Painted atomically, so the cleared screen is never shown on its own
+            self._write(SYNC_START + CLEAR_SCREEN + frame + SYNC_END)
+        else:
+            self.clear_screen()
+            self._write(frame)
+        self._flush()
     
     def get_key(self):
         """Get single key press"""
+        # Inside a navigation session the terminal is already raw
+        if self._raw_mode:
+            return self._read_key()
+        with _RawMode(sys.stdin.fileno()):
+            return self._read_key()
+    
+    def key_waiting(self) -> bool:
+        """Check whether another key press is already queued"""
+        return bool(self._pending_keys) or bool(select.select([sys.stdin.fileno()], [], [], 0)[0])
+    
+    def _read_key(self):
+        """Read one key press from a terminal that is already in raw mode"""
         fd = sys.stdin.fileno()
-        old_settings = termios.tcgetattr(fd)
-        try:
-            tty.setraw(sys.stdin.fileno())
-            while True:
-                key = sys.stdin.read(1)
-                if key == '\x1b':  # ESC sequence
-                    # Read next 2 chars to check if it's an arrow key
-                    next_chars = sys.stdin.read(2)
-                    if next_chars in ['[A', '[B', '[C', '[D']:  # Arrow keys
-                        return key + next_chars
-                    # Ignore standalone ESC - continue reading
-                    continue
-                else:
-                    return key
-        finally:
-            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+        # Everything available is read at once, so a burst (key repeat, paste) is parsed in one go
+        while not self._pending_keys:
+            if self._partial_key and not select.select([fd], [], [], ESC_SEQUENCE_TIMEOUT)[0]:
+                # Nothing followed: a standalone ESC, which is ignored
+                self._partial_key = ''
+                continue
+            data = os.read(fd, 1024)
+            if not data:
+                return ''
+            keys, self._partial_key = split_keys(self._partial_key + self._key_decoder.decode(data))
+            self._pending_keys.extend(keys)
+        return self._pending_keys.popleft()
     
     def display_header(self):
         """Display simple, clean header"""
-        header_text = Text("PHONE FARM MANAGER", style=f"bold {THEME['primary']}")
-        header_text.justify = "center"
-        
-        header = Panel(
-            header_text,
-            border_style=THEME['primary'],
-            box=box.DOUBLE_EDGE,
-            padding=(0, 0),
-            style="on black"
-        )
+        if self._header_panel is None:
+            header_text = Text("PHONE FARM MANAGER", style=f"bold {THEME['primary']}")
+            header_text.justify = "center"
+            
+            self._header_panel = Panel(
+                header_text,
+                border_style=THEME['primary'],
+                box=box.DOUBLE_EDGE,
+                padding=(0, 0),
+                style="on black"
+            )
         
-        self.console.print(header)
+        self.console.print(self._header_panel)
+    
+    def menu_item_text(self, item: dict, idx: int) -> Text:
+        """Get one menu line, marked if it is the selected item (shared; don't modify it)"""
+        return build_menu_item_text(item.get('label', ''), idx == self.selected_index,
+                                    item.get('action') in DIM_ACTIONS)
     
     def display_menu(self, items: List[dict], title: str = "Main Menu", show_separators: bool = True):
         """Display clean, aligned menu"""
         menu_text = Text()
+        self._item_rows = []
+        row = 0
         
         for idx, item in enumerate(items):
-            label = item.get('label', '')
-            
-            # Simple selection with arrow
-            if idx == self.selected_index:
-                menu_text.append("  ▶  ", style=THEME['primary'])
-                menu_text.append(label, style=f"bold {THEME['highlight']}")
-            else:
-                menu_text.append("     ", style="")
-                if item.get('action') in ['exit', 'back']:
-                    menu_text.append(label, style=THEME['dim'])
-                else:
-                    menu_text.append(label, style=THEME['text'])
+            self._item_rows.append(row)
+            menu_text.append_text(self.menu_item_text(item, idx))
+            row += 1
             
             # Only add separators for main menu
-            if show_separators and idx in [0, 1, 4]:
-                menu_text.append("\n     ─────────────────────────────", style=THEME['dim'])
+            if show_separators and idx in SEPARATOR_ROWS:
+                menu_text.append_text(MENU_SEPARATOR)
+                row += 1
             
             if idx < len(items) - 1:
                 menu_text.append("\n")
         
         # Simple controls line
-        menu_text.append("\n\n  ↑↓ Navigate   Enter Select   Q Exit", style=THEME['dim'])
+        menu_text.append_text(MENU_CONTROLS)
         
         # Clean panel
         panel = Panel(
@@ -114,46 +302,107 @@ class InteractiveMenu:
     
     def display_status(self, devices_count: int = 0, connected_count: int = 0):
         """Display simple status line"""
-        status_text = Text()
-        status_text.append("Devices: ", style=THEME['dim'])
-        status_text.append(f"{devices_count}", style=THEME['secondary'])
-        status_text.append("  │  ", style=THEME['dim'])
-        status_text.append("Connected: ", style=THEME['dim'])
-        color = THEME['success'] if connected_count > 0 else THEME['dim']
-        status_text.append(f"{connected_count}", style=color)
-        
-        status_text.justify = "center"
-        self.console.print(status_text)
+        self.console.print(build_status_text(devices_count, connected_count))
         self.console.print()
     
-    def navigate_menu(self, menu_items: List[dict], devices_count: int = 0, connected_count: int = 0, show_separators: bool = True) -> Optional[dict]:
-        """Navigate menu with arrow keys"""
-        while True:
-            self.clear_screen()
+    def repaint_menu_items(self, items: List[dict], indices: List[int]):
+        """Redraw menu lines of the navigate_menu frame in place, leaving the cursor where it was"""
+        updates = []
+        for idx in indices:
+            # Padded to the panel width so a longer previous line is fully overwritten
+            item_text = Text(style="on black")
+            item_text.append_text(self.menu_item_text(items[idx], idx))
+            item_text.align("left", self.MENU_CONTENT_WIDTH)
+            
+            with self.console.capture() as capture:
+                self.console.print(item_text, end="", no_wrap=True, overflow="crop")
+            
+            # Jump to the line and write it
+            row = self.MENU_FIRST_ROW + self._item_rows[idx]
+            updates.append(f"\x1b[{row};{self.MENU_CONTENT_COL}H{capture.get()}")
+        
+        # Save cursor, rewrite the lines, restore cursor - shown as one update
+        self._write(f"{SYNC_START}\x1b7{''.join(updates)}\x1b8{SYNC_END}")
+        self._flush()
+    
+    def _render_menu_frame(self, menu_items: List[dict], devices_count: int, connected_count: int,
+                           show_separators: bool, width: int) -> str:
+        """Render the full navigate_menu frame to a string, reusing it if this exact frame was drawn before"""
+        key = (self.selected_index, devices_count, connected_count, show_separators, width,
+               tuple((item.get('label', ''), item.get('action')) for item in menu_items))
+        cached = self._frame_cache.get(key)
+        if cached:
+            self._frame_cache.move_to_end(key)
+            frame, self._item_rows = cached
+            return frame
+        
+        with self.console.capture() as capture:
             self.display_header()
             self.console.print()  # Space after header
             self.display_status(devices_count, connected_count)
             self.console.print()  # Space before menu
             self.display_menu(menu_items, show_separators=show_separators)
-            
-            key = self.get_key()
-            
-            # Arrow navigation
-            if key == '\x1b[A':  # Up arrow
-                self.selected_index = (self.selected_index - 1) % len(menu_items)
-            elif key == '\x1b[B':  # Down arrow
-                self.selected_index = (self.selected_index + 1) % len(menu_items)
-            elif key in ['\r', '\n']:  # Enter
-                return menu_items[self.selected_index]
-            elif key in ['\x03', 'q', 'Q']:  # Ctrl+C, q (ESC is ignored)
-                return None
-            
-            # Number shortcuts (1-7 for menu items)
-            elif key.isdigit():
-                num = int(key) - 1
-                if 0 <= num < len(menu_items):
-                    self.selected_index = num
-                    return menu_items[num]
+        frame = capture.get()
+        
+        self._frame_cache[key] = (frame, self._item_rows)
+        if len(self._frame_cache) > self.FRAME_CACHE_SIZE:
+            self._frame_cache.popitem(last=False)
+        return frame
+    
+    def _menu_fits(self, size) -> bool:
+        """Check the whole navigate_menu frame is on screen, so its rows can be addressed directly"""
+        # Last item, then the blank, controls, bottom padding and border
+        last_row = self.MENU_FIRST_ROW + (self._item_rows[-1] if self._item_rows else 0) + 4
+        return size.columns >= 45 and size.lines > last_row
+    
+    def navigate_menu(self, menu_items: List[dict], devices_count: int = 0, connected_count: int = 0, show_separators: bool = True) -> Optional[dict]:
+        """Navigate menu with arrow keys"""
+        # Terminal size the full frame was drawn at, and the selection it shows
+        frame_size = None
+        drawn_index = None
+        last_index = len(menu_items) - 1
+        # The selection may be left over from a longer menu
+        self.selected_index = min(self.selected_index, last_index)
+        
+        # Raw mode for the whole session rather than toggled around every key
+        with _RawMode(sys.stdin.fileno()) as raw_mode:
+            self._raw_mode = raw_mode
+            try:
+                while True:
+                    # Draw only once queued input is used up, so a burst (key repeat,
+                    # fast presses) shows just the state it ends on
+                    if not self.key_waiting():
+                        size = shutil.get_terminal_size()
+                        if size != frame_size:
+                            # First draw, or the terminal was resized: put the whole frame
+                            # on screen with one write
+                            self.show_frame(self._render_menu_frame(menu_items, devices_count, connected_count,
+                                                                    show_separators, size.columns))
+                            # Only repaint rows in place when the frame's layout is known to be on screen
+                            frame_size = size if self._menu_fits(size) else None
+                        elif drawn_index != self.selected_index:
+                            # Only the old and new selection change; rewrite just those two lines
+                            self.repaint_menu_items(menu_items, [drawn_index, self.selected_index])
+                        drawn_index = self.selected_index
+                    
+                    key = self.get_key()
+                    
+                    # Arrow navigation
+                    if key == '\x1b[A':  # Up arrow, wrapping to the bottom
+                        self.selected_index = self.selected_index - 1 if self.selected_index else last_index
+                    elif key == '\x1b[B':  # Down arrow, wrapping to the top
+                        self.selected_index = self.selected_index + 1 if self.selected_index < last_index else 0
+                    elif key in ['\r', '\n']:  # Enter
+                        return menu_items[self.selected_index]
+                    elif key in ['\x03', 'q', 'Q']:  # Ctrl+C, q (ESC is ignored)
+                        return None
+                    
+                    # Number shortcuts (1-7 for menu items)
+                    elif (num := DIGIT_KEYS.get(key)) is not None and num <= last_index:
+                        self.selected_index = num
+                        return menu_items[num]
+            finally:
+                self._raw_mode = None
     
     def show_loading(self, message: str):
         """Display loading animation"""
@@ -174,6 +423,18 @@ class InteractiveMenu:
     
     def display_device_table(self, devices: List):
         """Display devices in a clean table"""
+        # Everything the table shows; unchanged devices reuse the last table as-is
+        contents = tuple(
+            (device.serial, device.model, device.status, device.proxy_status,
+             tuple((device.network_info or {}).get(key)
+                   for key in ('primary_ip', 'primary_interface', 'primary_type')))
+            for device in devices
+        )
+        if self._device_table_cache and self._device_table_cache[0] == contents:
+            self.console.print(self._device_table_cache[1])
+            self.console.print()
+            return
+        
         table = Table(
             show_header=True,
             header_style=THEME['secondary'],
@@ -182,45 +443,20 @@ class InteractiveMenu:
             pad_edge=False
         )
         
-        table.add_column("#", style=THEME['dim'], width=3)
-        table.add_column("Serial", style=THEME['text'])
-        table.add_column("Model", style=THEME['text'])
-        table.add_column("Interface", style=THEME['text'], justify="left")
-        table.add_column("IP Address", style=THEME['text'])
-        table.add_column("Proxy", justify="center")
-        table.add_column("Status", justify="center")
+        for header, options in DEVICE_TABLE_COLUMNS:
+            table.add_column(header, **options)
         
         for idx, device in enumerate(devices, 1):
-            if device.status == "connected":
-                status_color = THEME['success']
-                status_icon = "▸"  # Filled chevron for connected
-            elif device.status == "device":
-                status_color = THEME['warning']
-                status_icon = "›"  # Single chevron for authorized
-            elif device.status == "unauthorized":
-                status_color = THEME['error']
-                status_icon = "‹"  # Left chevron for unauthorized
-            elif device.status == "disconnected":
-                status_color = THEME['dim']
-                status_icon = "·"  # Small dot for disconnected
-            else:
-                status_color = THEME['text']
-                status_icon = "?"
+            status_icon, status_color = STATUS_STYLES.get(device.status, UNKNOWN_STATUS_STYLE)
             
             # Format network info
             interface_display = "-"
             ip_display = "-"
             
-            if hasattr(device, 'network_info') and device.network_info and device.network_info.get('primary_ip'):
-                ip_display = device.network_info['primary_ip']
-                interface = device.network_info['primary_interface']
-                
-                # Get interface type
-                interface_type = ""
-                for iface in device.network_info.get('interfaces', []):
-                    if iface['name'] == interface:
-                        interface_type = iface['type']
-                        break
+            if (network_info := device.network_info) and network_info.get('primary_ip'):
+                ip_display = network_info['primary_ip']
+                interface = network_info['primary_interface']
+                interface_type = network_info.get('primary_type') or ""
                 
                 # Format interface display - interface name in white, type can be subtle
                 interface_display = f"{interface} ({interface_type})"
@@ -229,22 +465,8 @@ class InteractiveMenu:
             proxy_display = "-"
             proxy_color = THEME['dim']
             
-            if hasattr(device, 'proxy_status') and device.proxy_status:
-                if device.proxy_status == "Running":
-                    proxy_display = "▶ Running"
-                    proxy_color = THEME['success']
-                elif device.proxy_status == "App Open":
-                    proxy_display = "◐ App Open"
-                    proxy_color = THEME['warning']
-                elif device.proxy_status == "Set (No App)":
-                    proxy_display = "⚠ Set (No App)"
-                    proxy_color = THEME['warning']
-                elif device.proxy_status == "Stopped":
-                    proxy_display = "◼ Stopped"
-                    proxy_color = THEME['dim']
-                else:
-                    proxy_display = device.proxy_status
-                    proxy_color = THEME['dim']
+            if proxy_status := device.proxy_status:
+                proxy_display, proxy_color = PROXY_STYLES.get(proxy_status, (proxy_status, THEME['dim']))
             
             table.add_row(
                 str(idx),
@@ -256,6 +478,7 @@ class InteractiveMenu:
                 Text(f"{status_icon} {device.status}", style=status_color)
             )
         
+        self._device_table_cache = (contents, table)
         self.console.print(table)
         self.console.print()
 
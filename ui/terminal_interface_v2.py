@@ -27,16 +27,32 @@ from ui.interactive_menu import InteractiveMenu, create_menu_items, THEME
 try:
     from config.farm_settings import PERFORMANCE, DISPLAY
 except ImportError:
-    PERFORMANCE = {'fast_mode_threshold': 20, 'auto_continue_threshold': 20}
+    PERFORMANCE = {'fast_mode_threshold': 20, 'auto_continue_threshold': 20,
+                   'max_parallel_operations': {'configure': 25, 'export': 8}}
     DISPLAY = {'show_metrics': True}
 
+# Super Proxy export commands, built once and reused for every device
+SUPER_PROXY_STOP_ARGV = ("am", "force-stop", "com.superproxy")
+SUPER_PROXY_LAUNCH_ARGV = ("monkey", "-p", "com.superproxy", "-c", "android.intent.category.LAUNCHER", "1")
+SUPER_PROXY_ACTIVITY_ARGVS = (
+    ("am", "start", "-n", "com.superproxy/com.superproxy.MainActivity"),
+    ("am", "start", "-n", "com.superproxy/.ui.MainActivity"),
+)
+# Polls on the device until Super Proxy has window focus (up to ~5s), instead of a fixed sleep
+SUPER_PROXY_FOCUS_WAIT = ("i=0; while [ $i -lt 25 ]; do "
+                          "dumpsys window | grep -q 'mCurrentFocus.*com.superproxy' && exit 0; "
+                          "sleep 0.2; i=$((i+1)); done; exit 1")
+DOUBLESPEED_SHARE_INTENT = ("am start -a android.intent.action.SEND -t text/plain "
+                            "--es android.intent.extra.TEXT proxy_config "
+                            "-n com.android.systemui.helper/.ShareReceiverActivity")
+
 
 class EnhancedTerminalInterface:
     def __init__(self):
         self.console = Console()
         self.menu = InteractiveMenu(self.console)
         self.device_manager = DeviceManager()
-        self.configurator = DeviceConfigurator()
+        self.configurator = DeviceConfigurator(self.device_manager.shell_pool)
         self.app_manager = AppManager()
         self.local_apk_installer = LocalAPKInstaller()
         self.bloatware_remover = BloatwareRemover()
@@ -123,29 +139,32 @@ class EnhancedTerminalInterface:
             
             task = progress.add_task(f"[{THEME['text']}] {task_name}...", total=len(devices))
             
-            results = []
-            for device in devices:
+            # Devices are independent, so run them together (bounded) and report each as it finishes
+            semaphore = asyncio.Semaphore(PERFORMANCE['max_parallel_operations']['configure'])
+            
+            async def run_one(device: Device):
                 try:
-                    result = await task_func(device)
-                    results.append((device, result))
+                    async with semaphore:
+                        result = await task_func(device)
                     status = "✓" if result else "✗"
                     color = THEME['success'] if result else THEME['error']
                     self.console.print(f"  [{color}]{status}[/{color}] {device.serial}", style=THEME['text'])
                 except Exception as e:
                     logger.error(f"Error processing {device.serial}: {e}")
-                    results.append((device, False))
+                    result = False
                     self.console.print(f"  [{THEME['error']}]✗[/{THEME['error']}] {device.serial}: {str(e)[:30]}")
                 
                 progress.update(task, advance=1)
+                return device, result
             
-            return results
+            return await asyncio.gather(*(run_one(device) for device in devices))
     
     async def refresh_connections(self):
         """Refresh all device connections - called from view_status now"""
         self.console.print(f"\n[{THEME['dim']}]Refreshing device connections...[/{THEME['dim']}]")
         
-        # Rescan for new devices (preserves existing connections)
-        await self.device_manager.scan_devices()
+        # Rescan for new devices (preserves existing connections), reusing a scan that just ran
+        await self.device_manager.scan_devices(max_age=self.device_manager.SCAN_TTL)
         
         # Try to connect to any authorized but not connected devices
         devices = list(self.device_manager.devices.values())
@@ -841,14 +860,17 @@ class EnhancedTerminalInterface:
             ) as progress:
             task = progress.add_task(f"Configuring devices...", total=len(selected_devices))
             
-            all_results = []
-            for device in selected_devices:
-                progress.update(task, description=f"Configuring {device.serial}...")
-                
-                results = await self.configurator.configure_device_security(device)
-                all_results.append((device, results))
-                
+            # Configure every device at once (bounded); results stay in selection order
+            semaphore = asyncio.Semaphore(PERFORMANCE['max_parallel_operations']['configure'])
+            
+            async def configure_one(device: Device):
+                async with semaphore:
+                    results = await self.configurator.configure_device_security(device)
+                progress.update(task, description=f"Configured {device.serial}")
                 progress.advance(task)
+                return device, results
+            
+            all_results = await asyncio.gather(*(configure_one(device) for device in selected_devices))
         
         # Show results
         self.console.print()
@@ -1488,6 +1510,142 @@ class EnhancedTerminalInterface:
             elif selection['action'] == 'super_proxy_export':
                 await self.export_super_proxy_config()
     
+    async def _adb_shell_async(self, serial: str, *args, timeout: float = 3) -> tuple:
+        """Run an adb shell command without blocking the event loop, returning (returncode, stdout)"""
+        process = await asyncio.create_subprocess_exec(
+            "adb", "-s", serial, "shell", *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            try:
+                process.kill()
+                await process.wait()
+            except ProcessLookupError:
+                pass
+            raise
+        return process.returncode, stdout.decode(errors="replace") if stdout else ""
+    
+    async def _run_device_script(self, serial: str, steps: List[tuple]):
+        """Run (command, sleep_seconds) steps as a single adb shell invocation (raises on failure)"""
+        # A failing step ends the script with its own exit status instead of the last sleep's
+        script = "; ".join(f"{cmd} || exit $?; sleep {delay}" for cmd, delay in steps)
+        timeout = 15 + sum(delay for _, delay in steps)
+        returncode, output = await self._adb_shell_async(serial, script, timeout=timeout)
+        if returncode != 0:
+            raise Exception(f"Device script exited with {returncode}: {output.strip()}")
+    
+    async def _export_config_for_device(self, serial: str):
+        """Drive the Super Proxy export flow on a single device (raises on failure)"""
+        def adb(*args, timeout=3):
+            return self._adb_shell_async(serial, *args, timeout=timeout)
+        
+        def step(message):
+            self.console.print(f"  [{THEME['dim']}]{serial}: {message}[/{THEME['dim']}]")
+        
+        # First, close any existing Super Proxy instance
+        step("Closing any existing Super Proxy...")
+        # force-stop returns once the process is gone, so no settle time is needed
+        await adb(*SUPER_PROXY_STOP_ARGV)
+        
+        # Launch Super Proxy app fresh
+        step("Opening Super Proxy app...")
+        # Try multiple launch methods
+        returncode, output = await adb(*SUPER_PROXY_LAUNCH_ARGV, timeout=5)
+        
+        if "No activities found" in output or returncode != 0:
+            # Try alternative launch, then a different activity name
+            for activity_argv in SUPER_PROXY_ACTIVITY_ARGVS:
+                returncode, _ = await adb(*activity_argv, timeout=5)
+                if returncode == 0:
+                    break
+        
+        # Wait for the app to come to the foreground; carry on either way and let the screen check decide
+        try:
+            await adb(SUPER_PROXY_FOCUS_WAIT, timeout=8)
+        except asyncio.TimeoutError:
+            pass
+        
+        # Check if we're on the proxy config screen (might see "Stop" button)
+        step("Checking current screen state...")
+        
+        # Dump UI to check current state, then read it back
+        await adb("uiautomator", "dump", "/sdcard/window_dump.xml")
+        returncode, output = await adb("cat", "/sdcard/window_dump.xml")
+        ui_content = output.lower() if returncode == 0 else ""
+        
+        # If we see "stop" or proxy is running, we need to stop it first
+        if "stop" in ui_content and "proxy" in ui_content:
+            step("Proxy is running, stopping it first...")
+            # Click Stop button (usually in center of screen), then back to main screen;
+            # a failed tap raises here rather than carrying on to the menu steps
+            await self._run_device_script(serial, [
+                ("input tap 540 960", 2),
+                ("input keyevent KEYCODE_BACK", 1),
+            ])
+        
+        # Now we should be on the main screen - click the 3 dots menu
+        step("Opening menu (3 dots in top right)...")
+        # Try different positions for different screen sizes
+        positions = [
+            (1000, 100),  # Top right for 1080p
+            (950, 100),   # Slightly left
+            (980, 150),   # Slightly lower
+        ]
+        
+        for x, y in positions:
+            await adb("input", "tap", str(x), str(y))
+            await asyncio.sleep(0.5)
+            
+            # Check if menu opened by dumping UI again
+            await adb("uiautomator", "dump", "/sdcard/window_dump.xml", timeout=2)
+            _, output = await adb("cat", "/sdcard/window_dump.xml", timeout=2)
+            
+            if "export" in output.lower():
+                break
+        else:
+            # Tapping blind from here would only report a misleading failure later on
+            raise Exception("Super Proxy menu did not open")
+        
+        await asyncio.sleep(1)
+        
+        # Click on "Export Config" option
+        step("Selecting 'Export Config'...")
+        # Try to click on text "Export Config" using different Y positions
+        export_positions = [
+            (850, 300),   # First menu item position
+            (850, 400),   # Second position
+            (850, 500),   # Third position
+        ]
+        
+        for x, y in export_positions:
+            await adb("input", "tap", str(x), str(y))
+            await asyncio.sleep(0.5)
+            
+            # Check if share dialog opened
+            _, output = await adb("dumpsys", "window", "windows", timeout=2)
+            
+            if "android.intent.action.SEND" in output or "ResolverActivity" in output:
+                break
+        
+        await asyncio.sleep(1)
+        
+        # Swipe up to see more apps, pick DoubleSpeed/SystemUI Helper (left side,
+        # middle of share sheet), fall back to launching it directly, then accept
+        # the permission dialog (bottom right "Accept", center "OK", slightly higher).
+        # Runs as one on-device script so the waits don't cost an adb round-trip each.
+        step("Selecting DoubleSpeed app and accepting permissions...")
+        await self._run_device_script(serial, [
+            ("input swipe 540 1500 540 500 300", 1),
+            ("input tap 270 1200", 0),
+            (DOUBLESPEED_SHARE_INTENT, 2),
+            ("input tap 900 1400", 0.5),
+            ("input tap 650 1400", 0.5),
+            ("input tap 900 1350", 0.5),
+        ])
+    
     async def export_super_proxy_config(self):
         """Export Super Proxy config to DoubleSpeed app"""
         devices = self.device_manager.get_connected_devices()
@@ -1517,164 +1675,27 @@ class EnhancedTerminalInterface:
         success_count = 0
         failed_count = 0
         
-        for device in selected_devices:
-            try:
-                self.console.print(f"[{THEME['text']}]Processing {device.serial}...[/{THEME['text']}]")
-                
-                # First, close any existing Super Proxy instance
-                self.console.print(f"  [{THEME['dim']}]Closing any existing Super Proxy...[/{THEME['dim']}]")
-                cmd = ["adb", "-s", device.serial, "shell", "am", "force-stop", "com.superproxy"]
-                subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                
-                await asyncio.sleep(1)
-                
-                # Launch Super Proxy app fresh
-                self.console.print(f"  [{THEME['dim']}]Opening Super Proxy app...[/{THEME['dim']}]")
-                # Try multiple launch methods
-                cmd = ["adb", "-s", device.serial, "shell", "monkey", "-p", "com.superproxy", "-c", "android.intent.category.LAUNCHER", "1"]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-                
-                if "No activities found" in result.stdout or result.returncode != 0:
-                    # Try alternative launch
-                    cmd = ["adb", "-s", device.serial, "shell", "am", "start", "-n", "com.superproxy/com.superproxy.MainActivity"]
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-                    
-                    if result.returncode != 0:
-                        # Try with different activity name
-                        cmd = ["adb", "-s", device.serial, "shell", "am", "start", "-n", "com.superproxy/.ui.MainActivity"]
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-                
-                # Wait for app to fully load
-                await asyncio.sleep(3)
-                
-                # Check if we're on the proxy config screen (might see "Stop" button)
-                self.console.print(f"  [{THEME['dim']}]Checking current screen state...[/{THEME['dim']}]")
-                
-                # Dump UI to check current state
-                cmd = ["adb", "-s", device.serial, "shell", "uiautomator", "dump", "/sdcard/window_dump.xml"]
-                subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                
-                # Read the dump to check for Stop button
-                cmd = ["adb", "-s", device.serial, "shell", "cat", "/sdcard/window_dump.xml"]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                ui_content = result.stdout.lower() if result.returncode == 0 else ""
-                
-                # If we see "stop" or proxy is running, we need to stop it first
-                if "stop" in ui_content and "proxy" in ui_content:
-                    self.console.print(f"  [{THEME['dim']}]Proxy is running, stopping it first...[/{THEME['dim']}]")
-                    # Click Stop button (usually in center of screen)
-                    cmd = ["adb", "-s", device.serial, "shell", "input", "tap", "540", "960"]
-                    subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                    await asyncio.sleep(2)
-                    
-                    # Click back arrow to return to main screen
-                    self.console.print(f"  [{THEME['dim']}]Going back to main screen...[/{THEME['dim']}]")
-                    cmd = ["adb", "-s", device.serial, "shell", "input", "keyevent", "KEYCODE_BACK"]
-                    subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                    await asyncio.sleep(1)
-                
-                # Now we should be on the main screen - click the 3 dots menu
-                self.console.print(f"  [{THEME['dim']}]Opening menu (3 dots in top right)...[/{THEME['dim']}]")
-                # Try different positions for different screen sizes
-                positions = [
-                    (1000, 100),  # Top right for 1080p
-                    (950, 100),   # Slightly left
-                    (980, 150),   # Slightly lower
-                ]
-                
-                for x, y in positions:
-                    cmd = ["adb", "-s", device.serial, "shell", "input", "tap", str(x), str(y)]
-                    subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                    await asyncio.sleep(0.5)
-                    
-                    # Check if menu opened by dumping UI again
-                    cmd = ["adb", "-s", device.serial, "shell", "uiautomator", "dump", "/sdcard/window_dump.xml"]
-                    subprocess.run(cmd, capture_output=True, text=True, timeout=2)
-                    cmd = ["adb", "-s", device.serial, "shell", "cat", "/sdcard/window_dump.xml"]
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
-                    
-                    if "export" in result.stdout.lower():
-                        break
-                
-                await asyncio.sleep(1)
-                
-                # Click on "Export Config" option
-                self.console.print(f"  [{THEME['dim']}]Selecting 'Export Config'...[/{THEME['dim']}]")
-                # Try to click on text "Export Config" using different Y positions
-                export_positions = [
-                    (850, 300),   # First menu item position
-                    (850, 400),   # Second position
-                    (850, 500),   # Third position
-                ]
-                
-                for x, y in export_positions:
-                    cmd = ["adb", "-s", device.serial, "shell", "input", "tap", str(x), str(y)]
-                    subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                    await asyncio.sleep(0.5)
-                    
-                    # Check if share dialog opened
-                    cmd = ["adb", "-s", device.serial, "shell", "dumpsys", "window", "windows"]
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
-                    
-                    if "android.intent.action.SEND" in result.stdout or "ResolverActivity" in result.stdout:
-                        break
-                
-                await asyncio.sleep(1)
-                
-                # Now we should see the share sheet - need to find DoubleSpeed
-                self.console.print(f"  [{THEME['dim']}]Looking for DoubleSpeed app in share sheet...[/{THEME['dim']}]")
-                
-                # First swipe up to see more apps if needed
-                cmd = ["adb", "-s", device.serial, "shell", "input", "swipe", "540", "1500", "540", "500", "300"]
-                subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                
-                await asyncio.sleep(1)
-                
-                # Try to click on DoubleSpeed/SystemUI Helper by text
-                # Use uiautomator to click by text if possible
-                self.console.print(f"  [{THEME['dim']}]Selecting DoubleSpeed app...[/{THEME['dim']}]")
-                
-                # Try clicking by text
-                cmd = ["adb", "-s", device.serial, "shell", 
-                       "input", "tap", "270", "1200"]  # Left side, middle of share sheet
-                subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                
-                # Alternative: try to launch directly
-                cmd = ["adb", "-s", device.serial, "shell", 
-                       "am", "start", "-a", "android.intent.action.SEND",
-                       "-t", "text/plain",
-                       "--es", "android.intent.extra.TEXT", "proxy_config",
-                       "-n", "com.android.systemui.helper/.ShareReceiverActivity"]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-                
-                await asyncio.sleep(2)
-                
-                # Check if permission dialog appeared and accept it
-                self.console.print(f"  [{THEME['dim']}]Checking for permission dialog...[/{THEME['dim']}]")
-                
-                # Click Accept/Allow/OK button (usually at bottom right)
-                accept_positions = [
-                    (900, 1400),   # Bottom right for "Accept"
-                    (650, 1400),   # Center bottom for "OK"
-                    (900, 1350),   # Slightly higher
-                ]
-                
-                for x, y in accept_positions:
-                    cmd = ["adb", "-s", device.serial, "shell", "input", "tap", str(x), str(y)]
-                    subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-                    await asyncio.sleep(0.5)
-                
+        # Devices are independent, so overlap their waits; cap concurrency to avoid
+        # overloading the adb server
+        semaphore = asyncio.Semaphore(PERFORMANCE['max_parallel_operations']['export'])
+        
+        async def export_on_device(device):
+            async with semaphore:
+                try:
+                    await self._export_config_for_device(device.serial)
+                    return device, None
+                except Exception as e:
+                    return device, e
+        
+        for next_done in asyncio.as_completed([export_on_device(d) for d in selected_devices]):
+            device, error = await next_done
+            if error is None:
                 self.console.print(f"  [{THEME['success']}]✓[/{THEME['success']}] Completed for {device.serial}")
                 success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to export config for {device.serial}: {e}")
-                self.console.print(f"  [{THEME['error']}]✗[/{THEME['error']}] Failed for {device.serial}: {str(e)[:50]}")
+            else:
+                logger.error(f"Failed to export config for {device.serial}: {error}")
+                self.console.print(f"  [{THEME['error']}]✗[/{THEME['error']}] Failed for {device.serial}: {str(error)[:50]}")
                 failed_count += 1
-            
-            # Small delay between devices
-            if device != selected_devices[-1]:
-                await asyncio.sleep(1)
         
         self.console.print()
         self.console.print(f"[{THEME['secondary']}]Export Complete[/{THEME['secondary']}]")